@@ -26,15 +26,49 @@ CONIFG_DEFAULT: Dict[str, GSC] = {
         "自动签到时间 [小时, 分钟]",
         ["8", "30"],
     ),
+    "SignWindowEnable": GsBoolConfig(
+        "分散签到",
+        "开启后定时签到不再集中在签到时间，而是将账号均匀分散到签到时间至截止时间之间",
+        False,
+    ),
+    "SignWindowEnd": GsListStrConfig(
+        "分散签到截止时间",
+        "分散签到模式下所有账号需在此时间前完成 [小时, 分钟]",
+        ["9", "30"],
+    ),
     "SigninConcurrentNum": GsIntConfig(
-        "并发数",
-        "自动签到并发数量，最大10",
+        "初始并发数",
+        "自动签到起始并发数量，运行中按接口延迟和错误率自动调整",
         1,
-        max_value=10,
+        max_value=50,
+    ),
+    "SigninMaxConcurrentNum": GsIntConfig(
+        "最大并发数",
+        "自动签到并发数量上限",
+        16,
+        max_value=50,
+    ),
+    "AccessTokenTTL": GsIntConfig(
+        "AccessToken复用时长(分钟)",
+        "签到时复用已刷新的AccessToken的最长时间，0为每次都刷新",
+        60,
+        max_value=1440,
+    ),
+    "TokenSweep": GsBoolConfig(
+        "签到前预热Token",
+        "在定时签到前AccessToken复用时长的一半时间内低速刷新账号Token，提前标记失效账号，"
+        "签到时直接复用，每个账号每天只轮换一次；AccessToken复用时长为0时不生效",
+        False,
+    ),
+    "TokenSweepRate": GsIntConfig(
+        "预热速度(个/分钟)",
+        "签到前预热每分钟最多刷新的账号数",
+        20,
+        max_value=600,
     ),
     "PrivateSignReport": GsBoolConfig(
         "私聊推送签到结果",
-        "是否私聊推送签到结果",
+        "是否私聊推送签到结果，每个账号签到完成后单独推送一条",
         False,
     ),
     "GroupSignReport": GsBoolConfig(
@@ -42,6 +76,18 @@ CONIFG_DEFAULT: Dict[str, GSC] = {
         "是否群聊推送签到结果",
         False,
     ),
+    "ReportConcurrentNum": GsIntConfig(
+        "推送并发数",
+        "签到结果同时推送的消息数",
+        3,
+        max_value=20,
+    ),
+    "ReportRate": GsIntConfig(
+        "推送限速(条/秒)",
+        "每个Bot每秒最多推送的签到结果消息数，0为不限制",
+        1,
+        max_value=20,
+    ),
     "LoginUrl": GsStrConfig(
         "登录链接",
         "自定义登录页面URL，为空则使用本地地址",
@@ -52,11 +98,86 @@ CONIFG_DEFAULT: Dict[str, GSC] = {
         "强制登录链接为自己的域名",
         False,
     ),
+    "LoginTrustedProxies": GsListStrConfig(
+        "可信反向代理",
+        "登录页经反向代理访问时填写代理的IP，来自这些地址的请求按 X-Forwarded-For 识别用户IP，"
+        "为空则使用连接来源IP",
+        [],
+    ),
+    "LoginRateSendCodeAuth": GsIntConfig(
+        "验证码单链接限速(次/分钟)",
+        "每个登录链接每分钟最多发送验证码次数，0为不限制",
+        2,
+        max_value=60,
+    ),
+    "LoginRateSendCodeIp": GsIntConfig(
+        "验证码单IP限速(次/分钟)",
+        "每个IP每分钟最多发送验证码次数，0为不限制",
+        6,
+        max_value=600,
+    ),
+    "LoginRateSendCodeGlobal": GsIntConfig(
+        "验证码总限速(次/分钟)",
+        "全站每分钟最多发送验证码次数，0为不限制",
+        60,
+        max_value=6000,
+    ),
+    "LoginRateLoginAuth": GsIntConfig(
+        "登录单链接限速(次/分钟)",
+        "每个登录链接每分钟最多提交登录次数，0为不限制",
+        6,
+        max_value=60,
+    ),
+    "LoginRateLoginIp": GsIntConfig(
+        "登录单IP限速(次/分钟)",
+        "每个IP每分钟最多提交登录次数，0为不限制",
+        20,
+        max_value=600,
+    ),
+    "LoginRateLoginGlobal": GsIntConfig(
+        "登录总限速(次/分钟)",
+        "全站每分钟最多提交登录次数，0为不限制",
+        120,
+        max_value=6000,
+    ),
     "LocalProxyUrl": GsStrConfig(
         "本地代理地址",
         "API请求使用的代理地址，为空则不使用代理",
         "",
     ),
+    "ApiRateLaohu": GsIntConfig(
+        "用户中心限速(次/秒)",
+        "user.laohu.com 验证码与登录接口每秒最大请求数，0为不限制",
+        2,
+        max_value=100,
+    ),
+    "ApiRateSign": GsIntConfig(
+        "签到接口限速(次/秒)",
+        "塔吉多签到、刷新Token接口每秒最大请求数，0为不限制",
+        5,
+        max_value=100,
+    ),
+    "ApiRateRead": GsIntConfig(
+        "查询接口限速(次/秒)",
+        "塔吉多角色、签到状态、公告等查询接口每秒最大请求数，0为不限制",
+        10,
+        max_value=100,
+    ),
+    "ApiHttp2": GsBoolConfig(
+        "HTTP/2",
+        "API请求启用HTTP/2连接复用，需安装 h2",
+        False,
+    ),
+    "MetricsEnable": GsBoolConfig(
+        "开启统计接口",
+        "开启后可通过 /tgd/metrics 获取接口与渲染耗时统计 (Prometheus 格式)",
+        False,
+    ),
+    "MetricsToken": GsStrConfig(
+        "统计接口Token",
+        "访问 /tgd/metrics 需携带 Authorization: Bearer <Token>，为空则不校验",
+        "",
+    ),
     "AnnOpen": GsBoolConfig(
         "公告推送",
         "是否开启异环公告推送功能",
@@ -5,6 +5,7 @@ import hashlib
 from pathlib import Path
 
 from pydantic import BaseModel
+from starlette.requests import Request
 from starlette.responses import HTMLResponse
 from jinja2 import Environment, FileSystemLoader
 
@@ -16,18 +17,26 @@ from gsuid_core.sv import SV
 from gsuid_core.web_app import app
 
 from ..tgdsign_config.tgdsign_config import TGDSignConfig
-from ..utils.cache import TimedCache
 from ..utils.api.api import GAMEID_HT, ALL_GAME_IDS
 from ..utils.api.calculate import get_random_device_id
 from ..utils.api.requests import tgd_api
-from ..utils.database.models import TGDBind, TGDUser
+from ..utils.token_store import refresh_locks, token_store
+from ..utils.database.models import TGDUser
+from ..tgdsign_sign.sign_handler import submit_login_sign
+from .pending import PendingLoginRegistry
+from .throttle import (
+    client_ip,
+    login_throttle,
+    too_many_requests,
+    sendcode_throttle,
+)
 
 sv_tgd_login = SV("TGDSign-登录", priority=1)
 
 TEMPLATE_DIR = Path(__file__).parent.parent / "templates"
 _jinja_env = Environment(loader=FileSystemLoader(str(TEMPLATE_DIR)))
 
-cache = TimedCache(timeout=180, maxsize=10)
+pending_logins = PendingLoginRegistry(timeout=180)
 
 
 def _get_token(user_id: str) -> str:
@@ -49,6 +58,59 @@ async def _get_server_url() -> tuple[str, bool]:
     return f"http://{_host}:{PORT}", True
 
 
+async def _discover_roles(
+    access_token: str,
+    tgd_uid: str,
+    device_id: str,
+) -> list[tuple[str, str, str]]:
+    """并发查询所有游戏的绑定角色和角色列表, 按 roleId 去重
+
+    返回 [(roleId, 角色名, gameId)], 顺序与逐个游戏查询时一致
+    """
+    bind_tasks = [
+        tgd_api.get_bind_role(access_token=access_token, uid=tgd_uid, game_id=gid)
+        for gid in ALL_GAME_IDS
+    ]
+    roles_tasks = [
+        tgd_api.get_game_roles(
+            access_token=access_token, uid=tgd_uid, device_id=device_id, game_id=gid,
+        )
+        for gid in ALL_GAME_IDS
+    ]
+    results = await asyncio.gather(*bind_tasks, *roles_tasks)
+    bind_results = results[: len(ALL_GAME_IDS)]
+    roles_results = results[len(ALL_GAME_IDS) :]
+
+    all_roles: list[tuple[str, str, str]] = []
+    existing_ids: set[str] = set()
+
+    def _add(rid: str, rname: str, gid: str):
+        if rid and rid not in existing_ids:
+            existing_ids.add(rid)
+            all_roles.append((rid, rname, gid))
+
+    for gid, res, roles_res in zip(ALL_GAME_IDS, bind_results, roles_results):
+        if res["status"] and "roleId" in res.get("data", {}):
+            rid = str(res["data"]["roleId"])
+            _add(
+                rid,
+                res["data"].get("roleName", rid),
+                str(res["data"].get("gameId", gid)),
+            )
+
+        if roles_res["status"] and roles_res.get("data"):
+            roles_list = (
+                roles_res["data"].get("roles", [])
+                if isinstance(roles_res["data"], dict)
+                else []
+            )
+            for r in roles_list:
+                rid = str(r.get("roleId", ""))
+                _add(rid, r.get("roleName", rid), str(r.get("gameId", gid)))
+
+    return all_roles
+
+
 @sv_tgd_login.on_fullmatch(("登录", "登陆", "login"), block=True)
 async def tgd_login(bot: Bot, ev: Event):
     await page_login(bot, ev)
@@ -60,17 +122,14 @@ async def page_login(bot: Bot, ev: Event):
     url, _ = await _get_server_url()
 
     # 检查是否已有登录进行中
-    existing = cache.get(user_token)
-    if isinstance(existing, dict):
+    if pending_logins.get(user_token) is not None:
         await bot.send(
             f"[TGDSign] 登录链接已发送，请在浏览器中完成操作\n{url}/tgd/i/{user_token}",
             at_sender=at_sender,
         )
         return
 
-    # 初始化缓存
-    data = {"mobile": -1, "code": -1, "user_id": ev.user_id}
-    cache.set(user_token, data)
+    pending = pending_logins.create(user_token, ev.user_id)
 
     login_url = f"{url}/tgd/i/{user_token}"
     await bot.send(
@@ -78,37 +137,20 @@ async def page_login(bot: Bot, ev: Event):
         at_sender=at_sender,
     )
 
-    # 轮询等待用户在网页完成登录
+    # 等待网页提交, 超时由登录注册表到期处理
     try:
-        for _ in range(180):
-            result = cache.get(user_token)
-            if result is None:
-                return await bot.send(
-                    "[TGDSign] 登录超时！",
-                    at_sender=at_sender,
-                )
-            if result.get("mobile") != -1 and result.get("code") != -1:
-                cache.delete(user_token)
-                break
-            await asyncio.sleep(1)
-        else:
-            cache.delete(user_token)
-            return await bot.send(
-                "[TGDSign] 登录超时！",
-                at_sender=at_sender,
-            )
-    except Exception as e:
-        logger.error(f"[TGDSign] 登录轮询异常: {e}")
-        cache.delete(user_token)
+        form = await pending.future
+    finally:
+        pending_logins.discard(pending)
+    if form is None:
         return await bot.send(
-            "[TGDSign] 登录异常，请重新发送登录指令",
+            "[TGDSign] 登录超时！",
             at_sender=at_sender,
         )
 
     # 执行登录流程
-    phone = result["mobile"]
-    code = result["code"]
-    device_id = result.get("device_id", get_random_device_id())
+    phone, code = form
+    device_id = pending.device_id or get_random_device_id()
 
     # 验证验证码
     res = await tgd_api.check_captcha(
@@ -144,75 +186,29 @@ async def page_login(bot: Bot, ev: Event):
     access_token = res["data"]["accessToken"]
     refresh_token = res["data"]["refreshToken"]
     tgd_uid = str(res["data"]["uid"])
-
-    # 获取所有游戏角色（遍历所有已知 gameId，不只是幻塔）
-    KNOWN_GAME_IDS = ALL_GAME_IDS
-    all_roles: list[tuple[str, str, str]] = []
-    existing_ids: set[str] = set()
-
-    for gid in KNOWN_GAME_IDS:
-        res = await tgd_api.get_bind_role(access_token=access_token, uid=tgd_uid, game_id=gid)
-        if res["status"] and "roleId" in res.get("data", {}):
-            rid = str(res["data"]["roleId"])
-            if rid not in existing_ids:
-                existing_ids.add(rid)
-                all_roles.append((
-                    rid,
-                    res["data"].get("roleName", rid),
-                    str(res["data"].get("gameId", gid)),
-                ))
-
-        roles_res = await tgd_api.get_game_roles(
-            access_token=access_token, uid=tgd_uid, device_id=device_id, game_id=gid,
-        )
-        if roles_res["status"] and roles_res.get("data"):
-            roles_list = (
-                roles_res["data"].get("roles", [])
-                if isinstance(roles_res["data"], dict)
-                else []
-            )
-            for r in roles_list:
-                rid = str(r.get("roleId", ""))
-                if rid and rid not in existing_ids:
-                    existing_ids.add(rid)
-                    all_roles.append((
-                        rid,
-                        r.get("roleName", rid),
-                        str(r.get("gameId", gid)),
-                    ))
-
-    # 每个角色一条 TGDUser 记录，没有角色则 uid=tgd_uid
+    # 与该账号进行中的 token 刷新互斥, 登录得到的新 token 不会被旧的轮换结果覆盖
+    async with refresh_locks.get(tgd_uid):
+        token_store.put(tgd_uid, access_token, refresh_token)
+
+    # 并发获取所有游戏角色（遍历所有已知 gameId，不只是幻塔）
+    all_roles = await _discover_roles(access_token, tgd_uid, device_id)
+
+    # 每个角色一条 TGDUser 记录，没有角色则 uid=tgd_uid; 绑定与用户记录一次写入
+    base = dict(
+        cookie=refresh_token,
+        tgd_uid=tgd_uid,
+        device_id=device_id,
+        sign_switch="off",
+        token_valid="",
+    )
     if all_roles:
-        for role_id, rname, gid in all_roles:
-            await TGDBind.insert_uid(
-                ev.user_id, ev.bot_id, role_id, ev.group_id, is_digit=False
-            )
-            await TGDUser.insert_data(
-                ev.user_id, ev.bot_id,
-                cookie=refresh_token,
-                uid=role_id,
-                tgd_uid=tgd_uid,
-                device_id=device_id,
-                role_name=rname,
-                game_id=gid,
-                sign_switch="off",
-                token_valid="",
-            )
+        users = [
+            dict(uid=role_id, role_name=rname, game_id=gid, **base)
+            for role_id, rname, gid in all_roles
+        ]
     else:
-        await TGDBind.insert_uid(
-            ev.user_id, ev.bot_id, tgd_uid, ev.group_id, is_digit=False
-        )
-        await TGDUser.insert_data(
-            ev.user_id, ev.bot_id,
-            cookie=refresh_token,
-            uid=tgd_uid,
-            tgd_uid=tgd_uid,
-            device_id=device_id,
-            role_name="",
-            game_id=GAMEID_HT,
-            sign_switch="off",
-            token_valid="",
-        )
+        users = [dict(uid=tgd_uid, role_name="", game_id=GAMEID_HT, **base)]
+    await TGDUser.bind_roles(ev.user_id, ev.bot_id, ev.group_id, users)
 
     role_names = [r[1] for r in all_roles]
     display_name = role_names[0] if role_names else tgd_uid
@@ -221,83 +217,16 @@ async def page_login(bot: Bot, ev: Event):
         f"tgd_uid={tgd_uid}, roles={role_names}"
     )
 
-    # 登录后立即签到
-    from ..utils.database.models import TGDSignData, TGDSignRecord
-
-    sign_msgs = [f"[TGDSign] {display_name} 登录成功"]
+    msgs = [f"[TGDSign] {display_name} 登录成功"]
     if role_names:
-        sign_msgs.append(f"绑定角色: {'、'.join(role_names)}")
+        msgs.append(f"绑定角色: {'、'.join(role_names)}")
+    msgs.append("正在签到，结果稍后发送")
+    await bot.send("\n".join(msgs), at_sender=at_sender)
 
-    # APP签到
-    primary_uid = all_roles[0][0] if all_roles else tgd_uid
-    res = await tgd_api.app_signin(
-        access_token=access_token, uid=tgd_uid, device_id=device_id
+    # 首次签到在后台排队执行, 与定时签到共用并发控制
+    submit_login_sign(
+        bot, ev.user_id, ev.bot_id, [u["uid"] for u in users], at_sender
     )
-    if res["status"]:
-        exp = res["data"].get("exp", 0)
-        gold_coin = res["data"].get("goldCoin", 0)
-        sign_msgs.append(f"APP签到成功，获得{exp}经验，{gold_coin}金币")
-        await TGDSignRecord.upsert_sign(
-            TGDSignData.build_app_sign(primary_uid)
-        )
-    else:
-        msg = res["message"]
-        if "已经签到" in msg or "签到过" in msg or "重复签到" in msg:
-            sign_msgs.append("APP今日已签到")
-            await TGDSignRecord.upsert_sign(
-                TGDSignData.build_app_sign(primary_uid)
-            )
-        else:
-            sign_msgs.append(f"APP签到失败: {msg}")
-
-    # 游戏签到（按角色所属游戏分别调用对应 gameId 的接口）
-    if all_roles:
-        from collections import defaultdict
-        roles_by_game: dict[str, list[tuple[str, str]]] = defaultdict(list)
-        for role_id, rname, gid in all_roles:
-            roles_by_game[gid or GAMEID_HT].append((role_id, rname))
-
-        for game_id, roles in roles_by_game.items():
-            signin_state = await tgd_api.get_signin_state(
-                access_token=access_token, game_id=game_id
-            )
-            signin_rewards = await tgd_api.get_signin_rewards(
-                access_token=access_token, game_id=game_id
-            )
-
-            for role_id, rname in roles:
-                res = await tgd_api.game_signin(
-                    access_token=access_token,
-                    role_id=role_id,
-                    game_id=game_id,
-                )
-                if res["status"]:
-                    reward_msg = "游戏签到成功"
-                    if signin_state["status"] and signin_rewards["status"]:
-                        try:
-                            days = signin_state["data"]["days"]
-                            reward = signin_rewards["data"][days]
-                            reward_msg = (
-                                f"获得{reward['name']}*{reward['num']}"
-                            )
-                        except (KeyError, IndexError, TypeError):
-                            pass
-                    sign_msgs.append(f"{rname} {reward_msg}")
-                    await TGDSignRecord.upsert_sign(
-                        TGDSignData.build_game_sign(role_id)
-                    )
-                else:
-                    msg = res["message"]
-                    if "已经签到" in msg or "签到过" in msg or "重复签到" in msg:
-                        sign_msgs.append(f"{rname} 今日已签到")
-                        await TGDSignRecord.upsert_sign(
-                            TGDSignData.build_game_sign(role_id)
-                        )
-                    else:
-                        sign_msgs.append(f"{rname} 游戏签到失败: {msg}")
-
-    sign_msgs.append("发 tgd开启自动签到 以开启每日自动签到")
-    return await bot.send("\n".join(sign_msgs), at_sender=at_sender)
 
 
 # ===== FastAPI 路由 =====
@@ -305,8 +234,8 @@ async def page_login(bot: Bot, ev: Event):
 
 @app.get("/tgd/i/{auth}")
 async def tgd_login_page(auth: str):
-    temp = cache.get(auth)
-    if temp is None:
+    pending = pending_logins.get(auth)
+    if pending is None:
         template = _jinja_env.get_template("404.html")
         return HTMLResponse(template.render())
 
@@ -316,7 +245,7 @@ async def tgd_login_page(auth: str):
         template.render(
             server_url=url,
             auth=auth,
-            userId=temp.get("user_id", ""),
+            userId=pending.user_id,
         )
     )
 
@@ -327,16 +256,18 @@ class SendCodeModel(BaseModel):
 
 
 @app.post("/tgd/sendcode")
-async def tgd_sendcode(data: SendCodeModel):
-    temp = cache.get(data.auth)
-    if temp is None:
+async def tgd_sendcode(data: SendCodeModel, request: Request):
+    # 先在本地限流, 超限请求不消耗上游短信额度
+    if not sendcode_throttle.allow(data.auth, client_ip(request)):
+        return too_many_requests()
+
+    pending = pending_logins.get(data.auth)
+    if pending is None:
         return {"success": False, "msg": "链接已过期，请重新发送登录指令"}
 
-    device_id = temp.get("device_id")
-    if not device_id:
-        device_id = get_random_device_id()
-        temp["device_id"] = device_id
-        cache.set(data.auth, temp)
+    if not pending.device_id:
+        pending.device_id = get_random_device_id()
+    device_id = pending.device_id
 
     res = await tgd_api.send_captcha(phone=data.phone, device_id=device_id)
     if res["status"]:
@@ -352,12 +283,10 @@ class LoginModel(BaseModel):
 
 
 @app.post("/tgd/login")
-async def tgd_web_login(data: LoginModel):
-    temp = cache.get(data.auth)
-    if temp is None:
-        return {"success": False, "msg": "链接已过期，请重新发送登录指令"}
+async def tgd_web_login(data: LoginModel, request: Request):
+    if not login_throttle.allow(data.auth, client_ip(request)):
+        return too_many_requests()
 
-    temp["mobile"] = data.mobile
-    temp["code"] = data.code
-    cache.set(data.auth, temp)
+    if not pending_logins.resolve(data.auth, data.mobile, data.code):
+        return {"success": False, "msg": "链接已过期，请重新发送登录指令"}
     return {"success": True, "msg": "登录中，请返回聊天查看结果"}
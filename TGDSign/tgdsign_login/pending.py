@@ -0,0 +1,72 @@
+"""等待网页提交的登录请求
+
+每个进行中的登录对应一个 Future, 网页提交验证码时直接完成该 Future,
+Bot 侧的登录协程随即继续执行, 无需轮询; 过期由 loop.call_later 定时处理。
+"""
+
+import asyncio
+from typing import Dict, Tuple, Optional
+
+# (手机号, 验证码)
+LoginForm = Tuple[str, str]
+
+
+class PendingLogin:
+    __slots__ = ("auth", "user_id", "device_id", "future", "_timer")
+
+    def __init__(
+        self,
+        auth: str,
+        user_id: str,
+        future: "asyncio.Future[Optional[LoginForm]]",
+        timer: asyncio.TimerHandle,
+    ):
+        self.auth = auth
+        self.user_id = user_id
+        self.device_id: Optional[str] = None
+        self.future = future
+        self._timer = timer
+
+
+class PendingLoginRegistry:
+    def __init__(self, timeout: float = 180):
+        self.timeout = timeout
+        self._pending: Dict[str, PendingLogin] = {}
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def create(self, auth: str, user_id: str) -> PendingLogin:
+        loop = asyncio.get_running_loop()
+        future: "asyncio.Future[Optional[LoginForm]]" = loop.create_future()
+        timer = loop.call_later(self.timeout, self._expire, auth, future)
+        pending = PendingLogin(auth, user_id, future, timer)
+        self._pending[auth] = pending
+        return pending
+
+    def get(self, auth: str) -> Optional[PendingLogin]:
+        pending = self._pending.get(auth)
+        if pending is None or pending.future.done():
+            return None
+        return pending
+
+    def resolve(self, auth: str, mobile: str, code: str) -> bool:
+        """网页提交手机号和验证码, 登录已过期或已提交过时返回 False"""
+        pending = self.get(auth)
+        if pending is None:
+            return False
+        pending.future.set_result((mobile, code))
+        return True
+
+    def discard(self, pending: PendingLogin):
+        """移除登录请求, 未提交时以 None 结束等待"""
+        if self._pending.get(pending.auth) is pending:
+            del self._pending[pending.auth]
+        pending._timer.cancel()
+        if not pending.future.done():
+            pending.future.set_result(None)
+
+    def _expire(self, auth: str, future: asyncio.Future):
+        pending = self._pending.get(auth)
+        if pending is not None and pending.future is future:
+            self.discard(pending)
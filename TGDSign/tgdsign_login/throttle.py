@@ -0,0 +1,117 @@
+"""登录路由限流
+
+每个路由按 auth、客户端 IP 和全局三级令牌桶限流, 超限请求直接在本地返回 429,
+不再转发给上游接口。auth / IP 的令牌桶放在有上限的 TTL 缓存中, 闲置后自动回收,
+伪造大量 auth 或 IP 也不会无限占用内存。
+
+限额 (次/分钟) 读取 LoginRate* 配置, 修改后对新请求立即生效。
+经反向代理访问时需在 LoginTrustedProxies 中填写代理地址, 否则所有用户共用代理的 IP 限额。
+"""
+
+from typing import Optional
+
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+
+from ..tgdsign_config.tgdsign_config import TGDSignConfig
+from ..utils.cache import TTLCache
+from ..utils.rate_limit import TokenBucket
+
+# 闲置超过该秒数的 auth / IP 令牌桶被回收, 届时令牌早已补满
+BUCKET_IDLE_TIMEOUT = 600
+BUCKET_MAXSIZE = 4096
+
+
+def _limit(config_name: str) -> float:
+    """配置中的每分钟次数, 0 为不限制"""
+    return TGDSignConfig.get_config(config_name).data
+
+
+def _burst(per_minute: float) -> float:
+    """允许的突发请求数: 约 15 秒的配额, 至少 2 次"""
+    return max(2, per_minute // 4)
+
+
+def _sync_bucket(bucket: TokenBucket, per_minute: float):
+    bucket.set_rate(per_minute / 60, capacity=_burst(per_minute))
+
+
+def _new_bucket(per_minute: float) -> TokenBucket:
+    return TokenBucket(per_minute / 60, capacity=_burst(per_minute))
+
+
+class RouteThrottle:
+    def __init__(self, auth_config: str, ip_config: str, global_config: str):
+        self.auth_config = auth_config
+        self.ip_config = ip_config
+        self.global_config = global_config
+        self._global = _new_bucket(_limit(global_config))
+        self._auth_buckets: TTLCache[TokenBucket] = TTLCache(
+            timeout=BUCKET_IDLE_TIMEOUT, maxsize=BUCKET_MAXSIZE
+        )
+        self._ip_buckets: TTLCache[TokenBucket] = TTLCache(
+            timeout=BUCKET_IDLE_TIMEOUT, maxsize=BUCKET_MAXSIZE
+        )
+        self.rejected = 0
+
+    @staticmethod
+    def _take(cache: TTLCache, key: str, config_name: str) -> bool:
+        per_minute = _limit(config_name)
+        bucket = cache.get(key)
+        if bucket is None:
+            bucket = _new_bucket(per_minute)
+        else:
+            _sync_bucket(bucket, per_minute)
+        # 每次访问都续期, 活跃客户端的令牌桶不会被回收重置
+        cache.set(key, bucket)
+        return bucket.try_acquire()
+
+    def allow(self, auth: str, ip: Optional[str]) -> bool:
+        """依次检查 auth、IP、全局限额, 单个客户端超限时不消耗全局令牌"""
+        _sync_bucket(self._global, _limit(self.global_config))
+        allowed = (
+            self._take(self._auth_buckets, auth, self.auth_config)
+            and (ip is None or self._take(self._ip_buckets, ip, self.ip_config))
+            and self._global.try_acquire()
+        )
+        if not allowed:
+            self.rejected += 1
+        return allowed
+
+
+def client_ip(request: Request) -> Optional[str]:
+    """客户端 IP
+
+    连接来自可信反向代理时, 从 X-Forwarded-For 右侧起跳过可信代理取第一个地址;
+    其他来源的转发头可被伪造, 一律忽略
+    """
+    peer = request.client.host if request.client else None
+    trusted = set(TGDSignConfig.get_config("LoginTrustedProxies").data)
+    if peer is None or peer not in trusted:
+        return peer
+
+    forwarded = request.headers.get("x-forwarded-for", "")
+    for addr in reversed([a.strip() for a in forwarded.split(",") if a.strip()]):
+        if addr not in trusted:
+            return addr
+    return request.headers.get("x-real-ip") or peer
+
+
+def too_many_requests() -> JSONResponse:
+    return JSONResponse(
+        {"success": False, "msg": "请求过于频繁，请稍后再试"},
+        status_code=429,
+    )
+
+
+# 发送验证码会消耗上游短信额度, 默认限额最严
+sendcode_throttle = RouteThrottle(
+    "LoginRateSendCodeAuth",
+    "LoginRateSendCodeIp",
+    "LoginRateSendCodeGlobal",
+)
+login_throttle = RouteThrottle(
+    "LoginRateLoginAuth",
+    "LoginRateLoginIp",
+    "LoginRateLoginGlobal",
+)
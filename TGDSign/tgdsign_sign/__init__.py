@@ -9,8 +9,9 @@ from gsuid_core.models import Event
 from gsuid_core.sv import SV
 
 from ..tgdsign_config.tgdsign_config import TGDSignConfig
-from ..utils.database.models import TGDSignRecord
+from ..utils.database.models import TGDSignRecord, TGDSignRun
 from .sign_handler import tgd_auto_sign_task, tgd_sign_handler
+from .token_sweep import sweep_window, tgd_token_sweep_task
 
 sv_tgd_sign = SV("TGDSign-签到", priority=1)
 sv_tgd_sign_all = SV("TGDSign-全部签到", pm=0)
@@ -39,21 +40,52 @@ async def tgd_sign_all(bot: Bot, ev: Event):
 SIGN_TIME_HOUR = int(SIGN_TIME[0])
 SIGN_TIME_MINUTE = SIGN_TIME[1]
 
+# 开启分散签到时, 从签到时间开始把账号分散到截止时间前执行
 scheduler.add_job(
     tgd_auto_sign_task,
     "cron",
     id="tgd_auto_sign",
     hour=SIGN_TIME_HOUR,
     minute=SIGN_TIME_MINUTE,
+    kwargs={"spread": True},
 )
 logger.info(
     f"[TGDSign] 定时签到已注册: 每天 {SIGN_TIME_HOUR}:{SIGN_TIME_MINUTE}"
 )
 
 
+# 启动后检查今日是否有因重启中断的自动签到任务, 有则续签
+async def resume_tgd_auto_sign():
+    if await TGDSignRun.get_unfinished_run() is None:
+        return
+    logger.info("[TGDSign] 检测到今日未完成的自动签到任务, 开始续签")
+    await tgd_auto_sign_task(spread=True)
+
+
+scheduler.add_job(
+    resume_tgd_auto_sign,
+    "date",
+    id="tgd_auto_sign_resume",
+    run_date=datetime.now() + timedelta(seconds=30),
+)
+
+
+# 签到前预热 Token, 在签到时间前 AccessTokenTTL / 2 启动, 签到开始时自行停止
+SWEEP_WINDOW = sweep_window()
+if SWEEP_WINDOW is not None:
+    scheduler.add_job(
+        tgd_token_sweep_task,
+        "cron",
+        id="tgd_token_sweep",
+        hour=SWEEP_WINDOW[0].hour,
+        minute=SWEEP_WINDOW[0].minute,
+    )
+
+
 # 每日清理2天前的签到记录
 @scheduler.scheduled_job("cron", hour=0, minute=5, id="tgd_clear_sign")
 async def clear_tgd_sign_record():
     two_days_ago = (datetime.now() - timedelta(days=2)).strftime("%Y-%m-%d")
     await TGDSignRecord.clear_sign_record(two_days_ago)
+    await TGDSignRun.clear_run(two_days_ago)
     logger.info("[TGDSign] 已清除2天前的签到记录")
@@ -1,12 +1,13 @@
 """TGDSign 签到核心逻辑"""
 
+import time
 import asyncio
-import random
+from enum import Enum
+from datetime import datetime
 from collections import defaultdict
-from typing import Dict, List, Optional
+from typing import Set, Dict, List, Tuple, Union, Optional, AsyncIterator
 
 from gsuid_core.bot import Bot
-from gsuid_core.gss import gss
 from gsuid_core.logger import logger
 from gsuid_core.models import Event
 from gsuid_core.segment import MessageSegment
@@ -14,60 +15,310 @@ from gsuid_core.subscribe import gs_subscribe
 
 from ..tgdsign_config import SIGN_RESULT_TYPE
 from ..tgdsign_config.tgdsign_config import TGDSignConfig
-from ..utils.api.requests import tgd_api
+from ..utils.api.requests import RequestOutcome, tgd_api
+from ..utils.report import ReportDispatcher
+from ..utils.limiter import AdaptiveLimiter
+from ..utils.metrics import tgd_metrics
 from ..utils.api.api import GAMEID_HT
+from ..utils.keyed_lock import SingleFlight
+from ..utils.token_store import refresh_locks, token_store
+from ..utils.database.write_buffer import SignWriteBuffer
 from ..utils.database.models import (
     TGDBind,
+    TGDSignRun,
     TGDSignData,
     TGDSignRecord,
+    TGDSignJournal,
+    TGDSignUser,
     TGDUser,
 )
 
+# 签到流程同时接受完整的 TGDUser 和自动签到流式读出的轻量投影
+SignUser = Union[TGDUser, TGDSignUser]
 
-async def _do_sign_for_account(
-    tgd_users: List[TGDUser],
+
+class SignOutcome(str, Enum):
+    """账号签到结果分类, 值同时作为任务日志的 state"""
+
+    SUCCESS = "success"
+    ALREADY_SIGNED = "already_signed"
+    TOKEN_EXPIRED = "token_expired"
+    RATE_LIMITED = "rate_limited"
+    NETWORK = "network"
+    FAILED = "failed"
+
+    @property
+    def is_success(self) -> bool:
+        return self in (SignOutcome.SUCCESS, SignOutcome.ALREADY_SIGNED)
+
+    @property
+    def retryable(self) -> bool:
+        """限流和网络失败稍后重试可能成功"""
+        return self in (SignOutcome.RATE_LIMITED, SignOutcome.NETWORK)
+
+
+# 账号内多个步骤结果不同时, 靠前的决定账号整体结果
+_OUTCOME_PRIORITY = [
+    SignOutcome.TOKEN_EXPIRED,
+    SignOutcome.NETWORK,
+    SignOutcome.RATE_LIMITED,
+    SignOutcome.FAILED,
+    SignOutcome.SUCCESS,
+    SignOutcome.ALREADY_SIGNED,
+]
+
+
+class AccountSignResult:
+    """单个账号的签到结果"""
+
+    __slots__ = ("tgd_uid", "outcome", "message")
+
+    def __init__(self, tgd_uid: str, outcome: SignOutcome, message: str):
+        self.tgd_uid = tgd_uid
+        self.outcome = outcome
+        self.message = message
+
+
+def _classify_failure(res: dict) -> SignOutcome:
+    if res.get("token_expired"):
+        return SignOutcome.TOKEN_EXPIRED
+    if res.get("rate_limited"):
+        return SignOutcome.RATE_LIMITED
+    if res.get("network"):
+        return SignOutcome.NETWORK
+    return SignOutcome.FAILED
+
+
+def _is_already_signed(msg: str) -> bool:
+    return "已经签到" in msg or "签到过" in msg or "重复签到" in msg
+
+
+# 签到并发控制器, 由所有 TaygedoApi 请求的延迟与错误反馈驱动
+sign_limiter = AdaptiveLimiter()
+
+
+def _feed_sign_limiter(outcome: RequestOutcome):
+    if outcome.is_overload:
+        sign_limiter.on_overload()
+    elif outcome.error is None:
+        sign_limiter.on_success(outcome.elapsed)
+
+
+tgd_api.add_observer(_feed_sign_limiter)
+tgd_metrics.add_gauge(
+    "tgd_sign_concurrency_limit",
+    "签到当前并发上限",
+    lambda: sign_limiter.current,
+)
+tgd_metrics.add_gauge(
+    "tgd_sign_in_flight",
+    "签到进行中的账号数",
+    lambda: sign_limiter.in_flight,
+)
+
+
+async def get_game_reward_msg(
+    signin_state: dict,
+    access_token: str,
+    game_id: str,
 ) -> str:
-    """对同一账号的所有角色执行签到, 返回结果消息"""
-    primary = tgd_users[0]
+    """根据签到成功后的签到状态, 从当日奖励表缓存中取出本次奖励"""
+    reward_msg = "游戏签到成功"
+    if not signin_state["status"]:
+        return reward_msg
+
+    signin_rewards = await tgd_api.get_signin_rewards(
+        access_token=access_token, game_id=game_id, is_cache=True
+    )
+    if not signin_rewards["status"]:
+        return reward_msg
+
+    try:
+        # 签到后的 days 已包含今天, 对应奖励表下标 days - 1
+        days = signin_state["data"]["days"]
+        if days >= 1:
+            reward = signin_rewards["data"][days - 1]
+            reward_msg = f"获得{reward['name']}*{reward['num']}"
+    except (KeyError, IndexError, TypeError):
+        pass
+    return reward_msg
+
+
+async def _get_access_token(
+    primary: SignUser,
+    writer: SignWriteBuffer,
+    force_refresh: bool = False,
+) -> Tuple[Optional[str], Optional[AccountSignResult]]:
+    """获取账号的 access token, 缓存仍有效时直接复用
+
+    返回 (access_token, 失败结果), 刷新失败时 access_token 为 None
+    """
     tgd_uid = primary.tgd_uid
 
-    # 刷新 token (一个账号只刷新一次)
+    if not force_refresh:
+        entry = token_store.get(tgd_uid)
+        if entry:
+            logger.debug(f"[TGDSign] 复用缓存 access token tgd_uid={tgd_uid}")
+            return entry.access_token, None
+
+    async with refresh_locks.get(tgd_uid):
+        # 等锁期间其他协程可能已完成刷新 (强制刷新前调用方已作废旧 token)
+        entry = token_store.get(tgd_uid)
+        if entry:
+            return entry.access_token, None
+        return await _refresh_access_token(primary, writer)
+
+
+async def _refresh_access_token(
+    primary: SignUser,
+    writer: SignWriteBuffer,
+) -> Tuple[Optional[str], Optional[AccountSignResult]]:
+    """调用 refreshToken 轮换 token, 需持有该账号的 refresh_locks"""
+    tgd_uid = primary.tgd_uid
+
+    # 优先使用内存中最新轮换的 refresh token
+    refresh_token = token_store.get_refresh_token(tgd_uid) or primary.cookie
     res = await tgd_api.refresh_token(
-        refresh_token=primary.cookie,
+        refresh_token=refresh_token,
         device_id=primary.device_id,
     )
     if not res["status"]:
         display = primary.role_name or tgd_uid
-        if res.get("token_expired"):
-            await TGDUser.set_token_valid_by_cookie(primary.cookie, valid=False)
+        outcome = _classify_failure(res)
+        if outcome == SignOutcome.TOKEN_EXPIRED:
+            token_store.discard(tgd_uid)
+            writer.set_token_valid(tgd_uid, valid=False)
             logger.warning(f"[TGDSign] 账号 {tgd_uid} token已失效, 已标记为无效")
-        return f"[{display}] Token已过期: {res['message']}，请重新登录"
+            message = f"[{display}] Token已过期: {res['message']}，请重新登录"
+        else:
+            message = f"[{display}] 刷新Token失败: {res['message']}"
+        return None, AccountSignResult(tgd_uid, outcome, message)
 
     access_token = res["data"]["accessToken"]
     new_refresh_token = res["data"]["refreshToken"]
+    token_store.put(tgd_uid, access_token, new_refresh_token)
 
     # 刷新成功, 确保标记为有效
     if primary.token_valid == "invalid":
-        await TGDUser.set_token_valid_by_cookie(primary.cookie, valid=True)
+        writer.set_token_valid(tgd_uid, valid=True)
         logger.info(f"[TGDSign] 账号 {tgd_uid} token已恢复有效")
 
     # 更新同账号所有记录的 cookie
-    await TGDUser.update_cookie_by_tgd_uid(
-        tgd_uid=tgd_uid, cookie=new_refresh_token
-    )
+    writer.set_cookie(tgd_uid, new_refresh_token)
     logger.debug(
         f"[TGDSign] token已刷新 tgd_uid={tgd_uid} "
         f"new_token={new_refresh_token[:8]}..."
     )
+    return access_token, None
+
+
+def _is_account_complete(
+    tgd_users: List[SignUser],
+    sign_records: Dict[str, TGDSignRecord],
+) -> bool:
+    """根据今日签到记录判断账号的社区签到和所有角色游戏签到是否都已完成"""
+    primary = tgd_users[0]
+    role_users = [u for u in tgd_users if u.uid != u.tgd_uid]
+    if primary in role_users:
+        # 社区签到记在第一个角色上, 与其游戏签到共用一条记录
+        if not TGDSignRecord.is_all_complete(sign_records.get(primary.uid)):
+            return False
+    else:
+        record = sign_records.get(primary.uid)
+        if not record or record.app_sign < 1:
+            return False
+
+    for u in role_users:
+        record = sign_records.get(u.uid)
+        if not record or record.game_sign < 1:
+            return False
+    return True
+
+
+# 同一账号同一组角色的签到进行中时, 手动签到 / 自动签到直接等待并共享其结果
+sign_flights = SingleFlight()
+
+
+async def sign_account(
+    tgd_users: List[SignUser],
+    writer: SignWriteBuffer,
+    sign_records: Optional[Dict[str, TGDSignRecord]] = None,
+) -> AccountSignResult:
+    """按 (tgd_uid, 角色集合) 合并并发签到的 _do_sign_for_account
+
+    只覆盖部分角色的签到 (如某个用户的手动签到) 不会与完整分组合并,
+    避免未签到的角色被当作已完成记入任务日志
+    """
+    key = (tgd_users[0].tgd_uid, frozenset(u.uid for u in tgd_users))
+    return await sign_flights.run(
+        key,
+        lambda: _do_sign_for_account(tgd_users, writer, sign_records),
+    )
+
+
+async def _do_sign_for_account(
+    tgd_users: List[SignUser],
+    writer: SignWriteBuffer,
+    sign_records: Optional[Dict[str, TGDSignRecord]] = None,
+) -> AccountSignResult:
+    """对同一账号的所有角色执行签到, 返回结果分类和消息
+
+    数据库写入交给 writer 批量完成;
+    sign_records 为预加载的今日签到记录 {uid: record}, 传入时不再逐个查库
+    """
+    primary = tgd_users[0]
+    tgd_uid = primary.tgd_uid
+
+    access_token, failure = await _get_access_token(primary, writer)
+    if failure is not None:
+        return failure
+
+    refreshed = False
+
+    async def _call(api_func, **kwargs) -> dict:
+        """调用需鉴权的接口, access token 被拒绝时刷新一次后重试"""
+        nonlocal access_token, refreshed
+        res = await api_func(access_token=access_token, **kwargs)
+        if res["status"] or not res.get("token_expired") or refreshed:
+            return res
+
+        refreshed = True
+        token_store.invalidate(tgd_uid)
+        new_token, _ = await _get_access_token(
+            primary, writer, force_refresh=True
+        )
+        if new_token is None:
+            return res
+        access_token = new_token
+        return await api_func(access_token=access_token, **kwargs)
+
+    async def _get_sign_record(uid: str) -> Optional[TGDSignRecord]:
+        if sign_records is not None:
+            return sign_records.get(uid)
+        return await TGDSignRecord.get_sign_data(uid)
+
+    def _mark_signed(sign_data: TGDSignData):
+        """写入签到记录, 并同步更新预加载的记录, 重试轮次不再重复签到已成功的部分"""
+        writer.add_sign(sign_data)
+        if sign_records is None:
+            return
+        record = sign_records.get(sign_data.uid)
+        if record is None:
+            record = sign_records[sign_data.uid] = TGDSignRecord(uid=sign_data.uid)
+        for field in ["app_sign", "game_sign"]:
+            value = getattr(sign_data, field)
+            if value is not None:
+                setattr(record, field, max(getattr(record, field), value))
 
     msg_parts: list[str] = []
+    outcomes: Set[SignOutcome] = set()
 
     # 社区签到 (一个账号只签一次, 用第一条记录追踪)
     uid = primary.uid
-    sign_record = await TGDSignRecord.get_sign_data(uid)
+    sign_record = await _get_sign_record(uid)
     if not sign_record or sign_record.app_sign < 1:
-        res = await tgd_api.app_signin(
-            access_token=access_token,
+        res = await _call(
+            tgd_api.app_signin,
             uid=tgd_uid,
             device_id=primary.device_id,
         )
@@ -75,107 +326,112 @@ async def _do_sign_for_account(
             exp = res["data"].get("exp", 0)
             gold_coin = res["data"].get("goldCoin", 0)
             msg_parts.append(f"社区签到成功，获得{exp}经验，{gold_coin}金币")
-            await TGDSignRecord.upsert_sign(TGDSignData.build_app_sign(uid))
+            _mark_signed(TGDSignData.build_app_sign(uid))
+            outcomes.add(SignOutcome.SUCCESS)
         else:
             msg = res["message"]
-            if "已经签到" in msg or "签到过" in msg or "重复签到" in msg:
+            if _is_already_signed(msg):
                 msg_parts.append("社区今日已签到")
-                await TGDSignRecord.upsert_sign(
-                    TGDSignData.build_app_sign(uid)
-                )
+                _mark_signed(TGDSignData.build_app_sign(uid))
+                outcomes.add(SignOutcome.ALREADY_SIGNED)
             else:
                 msg_parts.append(f"社区签到失败: {msg}")
+                outcomes.add(_classify_failure(res))
     else:
         msg_parts.append("社区今日已签到")
+        outcomes.add(SignOutcome.ALREADY_SIGNED)
 
     # 游戏签到 (每个角色，按所属游戏分别调用对应 gameId 的接口)
     role_users = [u for u in tgd_users if u.uid != u.tgd_uid]
     if role_users:
-        await asyncio.sleep(random.uniform(0.5, 1.5))
-
         # 按 game_id 分组：每个游戏单独查询签到状态和奖励表
-        users_by_game: Dict[str, List[TGDUser]] = defaultdict(list)
+        users_by_game: Dict[str, List[SignUser]] = defaultdict(list)
         for u in role_users:
             users_by_game[u.game_id or GAMEID_HT].append(u)
 
         for game_id, game_users in users_by_game.items():
-            signin_state = await tgd_api.get_signin_state(
-                access_token=access_token, game_id=game_id
-            )
-            signin_rewards = await tgd_api.get_signin_rewards(
-                access_token=access_token, game_id=game_id
-            )
+            # 签到状态只用于拼奖励消息, 有角色签到成功后才查询
+            signin_state: Optional[dict] = None
 
             for user in game_users:
-                role_sign = await TGDSignRecord.get_sign_data(user.uid)
+                role_sign = await _get_sign_record(user.uid)
                 rname = user.role_name or user.uid
 
                 if role_sign and role_sign.game_sign >= 1:
                     msg_parts.append(f"{rname} 今日已签到")
+                    outcomes.add(SignOutcome.ALREADY_SIGNED)
                     continue
 
-                res = await tgd_api.game_signin(
-                    access_token=access_token,
+                res = await _call(
+                    tgd_api.game_signin,
                     role_id=user.uid,
                     game_id=game_id,
                 )
                 if res["status"]:
-                    reward_msg = "游戏签到成功"
-                    if signin_state["status"] and signin_rewards["status"]:
-                        try:
-                            days = signin_state["data"]["days"]
-                            reward = signin_rewards["data"][days]
-                            reward_msg = (
-                                f"获得{reward['name']}*{reward['num']}"
-                            )
-                        except (KeyError, IndexError, TypeError):
-                            pass
-                    msg_parts.append(f"{rname} {reward_msg}")
-                    await TGDSignRecord.upsert_sign(
-                        TGDSignData.build_game_sign(user.uid)
+                    if signin_state is None:
+                        signin_state = await _call(
+                            tgd_api.get_signin_state, game_id=game_id
+                        )
+                    reward_msg = await get_game_reward_msg(
+                        signin_state, access_token, game_id
                     )
+                    msg_parts.append(f"{rname} {reward_msg}")
+                    _mark_signed(TGDSignData.build_game_sign(user.uid))
+                    outcomes.add(SignOutcome.SUCCESS)
                 else:
                     msg = res["message"]
-                    if "已经签到" in msg or "签到过" in msg or "重复签到" in msg:
+                    if _is_already_signed(msg):
                         msg_parts.append(f"{rname} 今日已签到")
-                        await TGDSignRecord.upsert_sign(
-                            TGDSignData.build_game_sign(user.uid)
-                        )
+                        _mark_signed(TGDSignData.build_game_sign(user.uid))
+                        outcomes.add(SignOutcome.ALREADY_SIGNED)
                     else:
                         msg_parts.append(f"{rname} 游戏签到失败: {msg}")
+                        outcomes.add(_classify_failure(res))
+
+    outcome = next(o for o in _OUTCOME_PRIORITY if o in outcomes)
+    return AccountSignResult(tgd_uid, outcome, "\n".join(msg_parts))
 
-                if len(role_users) > 1:
-                    await asyncio.sleep(random.uniform(0.3, 0.8))
 
-    return "\n".join(msg_parts)
+async def _iter_sign_groups(
+    users: AsyncIterator[TGDSignUser],
+) -> AsyncIterator[List[SignUser]]:
+    """将按 tgd_uid 排好序的用户流合并为同账号分组"""
+    group: List[SignUser] = []
+    async for user in users:
+        if group and user.tgd_uid != group[0].tgd_uid:
+            yield group
+            group = []
+        group.append(user)
+    if group:
+        yield group
 
 
 async def tgd_sign_handler(bot: Bot, ev: Event) -> str:
     """处理用户手动签到"""
-    tgd_users: list[TGDUser] = []
+    # 按 tgd_uid 分组, 同账号一起处理
+    groups: Dict[str, List[TGDUser]] = {}
     bind_data = await TGDBind.select_data(ev.user_id, ev.bot_id)
     if bind_data and bind_data.uid:
         uid_list = [u for u in bind_data.uid.split("_") if u]
-        for uid in uid_list:
-            user = await TGDUser.select_tgd_user(uid, ev.user_id, ev.bot_id)
-            if user and user.cookie:
-                tgd_users.append(user)
-
-    if not tgd_users:
-        tgd_users = await TGDUser.get_users_by_user_id(ev.user_id, ev.bot_id)
-
-    if not tgd_users:
+        for tgd_uid, users in (
+            await TGDUser.select_tgd_users(uid_list, ev.user_id, ev.bot_id)
+        ).items():
+            users = [u for u in users if u.cookie]
+            if users:
+                groups[tgd_uid] = users
+
+    if not groups:
+        for u in await TGDUser.get_users_by_user_id(ev.user_id, ev.bot_id):
+            groups.setdefault(u.tgd_uid, []).append(u)
+
+    if not groups:
         return "[TGDSign] 未登录，请先使用 登录 命令"
 
-    # 按 tgd_uid 分组, 同账号一起处理
-    groups: Dict[str, List[TGDUser]] = defaultdict(list)
-    for u in tgd_users:
-        groups[u.tgd_uid].append(u)
-
     msg_list = []
-    for users in groups.values():
-        result = await _do_sign_for_account(users)
-        msg_list.append(result)
+    async with SignWriteBuffer() as writer:
+        for users in groups.values():
+            result = await sign_account(users, writer)
+            msg_list.append(result.message)
 
     return (
         "\n-----------------------------\n".join(msg_list)
@@ -184,140 +440,379 @@ async def tgd_sign_handler(bot: Bot, ev: Event) -> str:
     )
 
 
-async def tgd_auto_sign_task() -> str:
-    """全部签到任务"""
-    signin_master = TGDSignConfig.get_config("SigninMaster").data
-    sched_signin = TGDSignConfig.get_config("SchedSignin").data
+# 登录后的首次签到交给少量后台协程排队执行, 与自动签到共用并发控制器和请求限速,
+# 大量用户同时登录时也只占用有限的签到并发, 不会挤占定时签到
+LOGIN_SIGN_WORKERS = 2
+
+# (Bot, user_id, bot_id, 角色ID列表, 是否 @ 发送者)
+LoginSignItem = Tuple[Bot, str, str, List[str], bool]
+_login_sign_queue: "asyncio.Queue[LoginSignItem]" = asyncio.Queue()
+_login_sign_workers: List[asyncio.Task] = []
+
+
+def submit_login_sign(
+    bot: Bot,
+    user_id: str,
+    bot_id: str,
+    uids: List[str],
+    at_sender: bool = False,
+):
+    """登录成功后排队签到, 结果另行推送给用户"""
+    _login_sign_queue.put_nowait((bot, user_id, bot_id, uids, at_sender))
+    if not _login_sign_workers:
+        _login_sign_workers.extend(
+            asyncio.create_task(_login_sign_worker())
+            for _ in range(LOGIN_SIGN_WORKERS)
+        )
 
-    if signin_master:
-        user_list: List[TGDUser] = await TGDUser.get_all_tgd_user()
-    elif sched_signin:
-        user_list: List[TGDUser] = await TGDUser.get_sign_switch_on_users()
-    else:
-        return "[TGDSign] 自动签到未开启"
 
-    if not user_list:
-        return "[TGDSign] 暂无需要签到的账号"
+async def _login_sign_worker():
+    while True:
+        bot, user_id, bot_id, uids, at_sender = await _login_sign_queue.get()
+        try:
+            await _login_sign(bot, user_id, bot_id, uids, at_sender)
+        except Exception as e:
+            logger.error(f"[TGDSign] 登录后签到 {user_id} 异常: {e}")
+        finally:
+            _login_sign_queue.task_done()
+
+
+async def _login_sign(
+    bot: Bot,
+    user_id: str,
+    bot_id: str,
+    uids: List[str],
+    at_sender: bool,
+):
+    groups = await TGDUser.select_tgd_users(uids, user_id, bot_id)
+    if not groups:
+        return
+
+    msg_list = []
+    async with SignWriteBuffer() as writer:
+        for users in groups.values():
+            async with sign_limiter:
+                result = await sign_account(users, writer)
+            msg_list.append(result.message)
+
+    msg_list.append("发 tgd开启自动签到 以开启每日自动签到")
+    await bot.send("\n".join(msg_list), at_sender=at_sender)
 
-    # 按 tgd_uid 分组
-    groups: Dict[str, List[TGDUser]] = defaultdict(list)
-    for u in user_list:
-        if u.cookie:
-            groups[u.tgd_uid].append(u)
 
-    max_concurrent: int = TGDSignConfig.get_config("SigninConcurrentNum").data
-    if max_concurrent > 10:
-        max_concurrent = 10
-    semaphore = asyncio.Semaphore(max_concurrent)
+def _collect_reports(
+    entries: List[TGDSignJournal],
+) -> Tuple[int, int, Dict[str, Dict]]:
+    """根据任务日志汇总成功/失败数和待推送的群聊消息
 
+    私聊消息在账号签到完成时已单独推送, 这里不再汇总
+    """
     success_count = 0
     fail_count = 0
-    private_msgs: Dict[str, List[str]] = {}
     group_msgs: Dict[str, Dict] = {}
 
-    async def _process_group(users: List[TGDUser]):
-        nonlocal success_count, fail_count
-        async with semaphore:
-            try:
-                await asyncio.sleep(random.random() * 1.5)
-
-                result = await _do_sign_for_account(users)
-                logger.info(
-                    f"[TGDSign] 自动签到 tgd_uid "
-                    f"{users[0].tgd_uid}: {result}"
+    for entry in entries:
+        is_success = SignOutcome(entry.state).is_success
+        if is_success:
+            success_count += 1
+        else:
+            fail_count += 1
+        if not entry.result:
+            continue
+
+        gid = entry.sign_switch
+        qid = entry.user_id
+        if gid not in ("on", "off"):
+            if gid not in group_msgs:
+                group_msgs[gid] = {
+                    "bot_id": entry.bot_id,
+                    "success": 0,
+                    "failed": 0,
+                    "push_message": [],
+                }
+            if is_success:
+                group_msgs[gid]["success"] += 1
+            else:
+                group_msgs[gid]["failed"] += 1
+                group_msgs[gid]["push_message"].extend(
+                    [
+                        MessageSegment.text("\n"),
+                        MessageSegment.at(qid),
+                        MessageSegment.text(entry.result),
+                    ]
                 )
 
-                is_success = "失败" not in result and "过期" not in result
-                if is_success:
-                    success_count += 1
-                else:
-                    fail_count += 1
-
-                # 收集消息 (用第一条记录的 sign_switch)
-                primary = users[0]
-                gid = primary.sign_switch
-                qid = primary.user_id
-
-                if gid == "on":
-                    if qid not in private_msgs:
-                        private_msgs[qid] = []
-                    private_msgs[qid].append(result)
-                elif gid != "off":
-                    if gid not in group_msgs:
-                        group_msgs[gid] = {
-                            "bot_id": primary.bot_id,
-                            "success": 0,
-                            "failed": 0,
-                            "push_message": [],
-                        }
-                    if is_success:
-                        group_msgs[gid]["success"] += 1
-                    else:
-                        group_msgs[gid]["failed"] += 1
-                        group_msgs[gid]["push_message"].extend(
-                            [
-                                MessageSegment.text("\n"),
-                                MessageSegment.at(qid),
-                                MessageSegment.text(result),
-                            ]
-                        )
+    return success_count, fail_count, group_msgs
 
-            except asyncio.TimeoutError:
-                fail_count += 1
-                logger.warning(
-                    f"[TGDSign] 自动签到 tgd_uid "
-                    f"{users[0].tgd_uid} 超时"
-                )
-            except Exception as e:
-                fail_count += 1
-                logger.error(
-                    f"[TGDSign] 自动签到 tgd_uid "
-                    f"{users[0].tgd_uid} 异常: {e}"
-                )
 
-    tasks = [_process_group(users) for users in groups.values()]
-    await asyncio.gather(*tasks, return_exceptions=True)
+# 没有历史数据时假定的单账号签到耗时(秒), 以及耗时滑动平均的权重
+DEFAULT_ACCOUNT_COST = 3.0
+COST_EMA_ALPHA = 0.2
+# 限流 / 网络失败账号的重试轮数, 以及第一轮重试前的等待秒数 (之后每轮翻倍)
+RETRY_PASSES = 2
+RETRY_PASS_DELAY = 30
+
+
+def _window_deadline() -> Optional[float]:
+    """分散签到模式下今日签到截止时间戳, 未开启时返回 None"""
+    if not TGDSignConfig.get_config("SignWindowEnable").data:
+        return None
+    end = TGDSignConfig.get_config("SignWindowEnd").data
+    deadline = datetime.now().replace(
+        hour=int(end[0]), minute=int(end[1]), second=0, microsecond=0
+    )
+    return deadline.timestamp()
+
+
+# 同一时间只运行一个自动签到任务, 避免定时任务与续签/全部签到重复执行
+_auto_sign_lock = asyncio.Lock()
+
+
+async def tgd_auto_sign_task(spread: bool = False) -> str:
+    """全部签到任务
+
+    spread 为 True 且开启分散签到时, 账号按计划时刻分散到截止时间前执行
+    """
+    if _auto_sign_lock.locked():
+        return "[TGDSign] 自动签到正在进行中"
+    async with _auto_sign_lock:
+        return await _run_auto_sign(spread)
+
+
+async def _run_auto_sign(spread: bool) -> str:
+    signin_master = TGDSignConfig.get_config("SigninMaster").data
+    sched_signin = TGDSignConfig.get_config("SchedSignin").data
+
+    if not signin_master and not sched_signin:
+        return "[TGDSign] 自动签到未开启"
+
+    # 今日有未完成的任务时续签, 已写入日志的账号不再重复签到
+    run = await TGDSignRun.get_unfinished_run()
+    if run is None:
+        run = await TGDSignRun.start_run()
+        finished_uids: Set[str] = set()
+    else:
+        finished_uids = await TGDSignJournal.get_finished_tgd_uids(run.id)
+        logger.info(
+            f"[TGDSign] 续签今日未完成的自动签到任务 #{run.id}, "
+            f"已完成 {len(finished_uids)} 个账号"
+        )
+    run_id = run.id
+
+    # 单账号耗时的滑动平均, 先验取本任务或上次任务的记录
+    avg_cost = (
+        run.avg_cost
+        or await TGDSignRun.get_last_avg_cost()
+        or DEFAULT_ACCOUNT_COST
+    )
+    deadline = _window_deadline() if spread else None
+
+    # 一次性加载今日签到记录, 已全部完成的账号直接跳过, 不刷新 token
+    sign_records: Dict[str, TGDSignRecord] = {
+        r.uid: r for r in await TGDSignRecord.get_all_sign_data_by_date()
+    }
+
+    # 并发上限由 AIMD 控制器按接口延迟和错误率动态调整
+    max_concurrency = TGDSignConfig.get_config("SigninMaxConcurrentNum").data
+    sign_limiter.configure(
+        TGDSignConfig.get_config("SigninConcurrentNum").data,
+        max_concurrency,
+    )
+
+    account_count = 0
+    skipped_count = 0
+
+    # 限流 / 网络失败的账号留到本轮结束后延迟重试
+    retry_groups: List[List[SignUser]] = []
+
+    async def _process_group(users: List[SignUser], final: bool):
+        nonlocal avg_cost
+        primary = users[0]
+        try:
+            # 请求速率由 TaygedoApi 的全局令牌桶控制, 无需额外随机等待
+            async with sign_limiter:
+                start = time.monotonic()
+                result = await sign_account(users, writer, sign_records)
+                cost = time.monotonic() - start
+                avg_cost += (cost - avg_cost) * COST_EMA_ALPHA
+            logger.info(
+                f"[TGDSign] 自动签到 tgd_uid {primary.tgd_uid} "
+                f"[{result.outcome.value}]: {result.message}"
+            )
+        except asyncio.TimeoutError:
+            logger.warning(
+                f"[TGDSign] 自动签到 tgd_uid "
+                f"{primary.tgd_uid} 超时"
+            )
+            result = AccountSignResult(primary.tgd_uid, SignOutcome.NETWORK, "")
+        except Exception as e:
+            logger.error(
+                f"[TGDSign] 自动签到 tgd_uid "
+                f"{primary.tgd_uid} 异常: {e}"
+            )
+            result = AccountSignResult(primary.tgd_uid, SignOutcome.FAILED, "")
 
-    # 推送签到结果
+        if result.outcome.retryable and not final:
+            retry_groups.append(users)
+            return
+
+        # 私聊推送随签到完成即时发出 (用第一条记录的 sign_switch 决定推送方式)
+        if private_report and result.message and primary.sign_switch == "on":
+            reporter.submit(
+                primary.bot_id, "direct", primary.user_id, result.message
+            )
+
+        # 结果写入任务日志
+        writer.add_journal(
+            run_id,
+            primary.tgd_uid,
+            result.outcome.value,
+            result.message,
+            primary.user_id,
+            primary.bot_id,
+            primary.sign_switch,
+        )
+
+    # 用户按 tgd_uid 有序流式读出, 边读边分组送入有界队列, 不一次性加载全表
+    # 队列元素为 (账号分组, 是否为最后一次尝试)
+    queue: asyncio.Queue[Optional[Tuple[List[SignUser], bool]]] = asyncio.Queue(
+        maxsize=max_concurrency * 2
+    )
+
+    async def _worker():
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            try:
+                await _process_group(*item)
+            finally:
+                queue.task_done()
+
+    async def _retry_passes():
+        """等待本轮全部完成后, 对可重试的账号按指数退避延迟重试"""
+        await queue.join()
+        for attempt in range(1, RETRY_PASSES + 1):
+            if not retry_groups:
+                return
+            groups = list(retry_groups)
+            retry_groups.clear()
+            delay = RETRY_PASS_DELAY * 2 ** (attempt - 1)
+            logger.info(
+                f"[TGDSign] 自动签到: {len(groups)} 个账号因限流或网络失败, "
+                f"{delay} 秒后第 {attempt} 次重试"
+            )
+            await asyncio.sleep(delay)
+            for users in groups:
+                await queue.put((users, attempt == RETRY_PASSES))
+            await queue.join()
+
+    # 分散签到: 先统计账号数, 按读取顺序把第 i 个账号安排在 [现在, 截止时间 - 单账号耗时]
+    # 内的第 i / total 处, 边读边派发, 不需要预先读出全部账号
+    spread_start = time.time()
+    spread_span = 0.0
+    spread_total = 0
+    if deadline is not None:
+        spread_total = max(
+            await TGDUser.count_sign_accounts(switch_on_only=not signin_master)
+            - len(finished_uids),
+            1,
+        )
+        spread_span = max(0.0, deadline - spread_start - avg_cost)
+        if spread_total * avg_cost / max_concurrency > spread_span:
+            logger.warning(
+                f"[TGDSign] 分散签到: 预计 {spread_total} 个账号无法在截止时间前"
+                f"完成, 将尽快执行"
+            )
+        logger.info(
+            f"[TGDSign] 分散签到: {spread_total} 个账号分布在 "
+            f"{spread_span / 60:.0f} 分钟内"
+        )
+
+    async def _wait_spread_slot(index: int, deadline: float):
+        """等到第 index 个 (从 0 开始) 账号的计划时刻"""
+        now = time.time()
+        # 按剩余账号和当前并发估算所需时间, 已落后于截止时间时不再等待
+        remaining = max(spread_total - index, 1)
+        behind = (
+            remaining * avg_cost / max(sign_limiter.current, 1)
+            >= deadline - now
+        )
+        delay = spread_start + index / spread_total * spread_span - now
+        if delay > 0 and not behind:
+            await asyncio.sleep(delay)
+
+    # 签到结果推送: 按所属 Bot 分发, 限并发和速率
     private_report = TGDSignConfig.get_config("PrivateSignReport").data
     group_report = TGDSignConfig.get_config("GroupSignReport").data
+    reporter = ReportDispatcher(
+        TGDSignConfig.get_config("ReportConcurrentNum").data,
+        TGDSignConfig.get_config("ReportRate").data,
+    )
+    reporter.start()
 
-    for bot_id in gss.active_bot:
-        bot = gss.active_bot[bot_id]
+    # 签到结果和任务日志批量写库, 结束时同步写入剩余数据
+    writer = SignWriteBuffer()
+    writer.start()
+    workers = [asyncio.create_task(_worker()) for _ in range(max_concurrency)]
+    spread_index = 0
+    try:
+        users_iter = TGDUser.iter_sign_users(switch_on_only=not signin_master)
+        async for users in _iter_sign_groups(users_iter):
+            account_count += 1
+            tgd_uid = users[0].tgd_uid
+            if tgd_uid in finished_uids:
+                continue
+            # 已完成的账号也占用计划位置, 计划时刻不随签到记录变化
+            index = spread_index
+            spread_index += 1
+            if _is_account_complete(users, sign_records):
+                skipped_count += 1
+                continue
+            if deadline is not None:
+                await _wait_spread_slot(index, deadline)
+            await queue.put((users, False))
+        await _retry_passes()
+    except BaseException:
+        await reporter.close()
+        raise
+    finally:
+        for _ in workers:
+            await queue.put(None)
+        await asyncio.gather(*workers, return_exceptions=True)
+        await writer.close()
 
-        # 私聊推送
-        if private_report and private_msgs:
-            for qid, msgs in private_msgs.items():
-                try:
-                    await bot.target_send(
-                        "\n".join(msgs),
-                        "direct", qid, "", "", "",
-                    )
-                except Exception as e:
-                    logger.error(f"[TGDSign] 私聊推送失败 {qid}: {e}")
-                await asyncio.sleep(random.uniform(0.5, 1.5))
+    try:
+        if not account_count and not finished_uids:
+            await TGDSignRun.finish_run(run_id, avg_cost)
+            return "[TGDSign] 暂无需要签到的账号"
+        if skipped_count:
+            logger.info(
+                f"[TGDSign] 自动签到: {skipped_count} 个账号今日已完成, 跳过"
+            )
 
-        # 群聊推送
-        if group_report and group_msgs:
+        # 汇总本任务 (含重启前已完成部分) 的全部结果, 每个群推送一次
+        success_count, fail_count, group_msgs = _collect_reports(
+            await TGDSignJournal.get_run_entries(run_id)
+        )
+        if group_report:
             for gid, data in group_msgs.items():
-                try:
-                    msg_content = (
-                        f"[塔吉多] 自动签到完成\n"
-                        f"成功 {data['success']}，"
-                        f"失败 {data['failed']}"
-                    )
-                    await bot.target_send(
-                        msg_content,
-                        "group", gid, data["bot_id"], "", "",
-                    )
-                except Exception as e:
-                    logger.error(f"[TGDSign] 群聊推送失败 {gid}: {e}")
-                await asyncio.sleep(random.uniform(0.5, 1.5))
+                reporter.submit(
+                    data["bot_id"],
+                    "group",
+                    gid,
+                    f"[塔吉多] 自动签到完成\n"
+                    f"成功 {data['success']}，"
+                    f"失败 {data['failed']}",
+                )
+    finally:
+        await reporter.close()
 
     msg = (
         f"[塔吉多] 自动签到完成\n"
         f"成功 {success_count} 个账号，失败 {fail_count} 个账号"
     )
+    if skipped_count:
+        msg += f"，{skipped_count} 个账号今日已完成"
 
     # 通过订阅系统推送签到结果
     try:
@@ -331,4 +826,6 @@ async def tgd_auto_sign_task() -> str:
     except Exception as e:
         logger.error(f"[TGDSign] 获取订阅列表失败: {e}")
 
+    # 推送完成后再结束任务, 推送前重启时续签会重新汇总并推送
+    await TGDSignRun.finish_run(run_id, avg_cost)
     return msg
@@ -0,0 +1,97 @@
+"""签到前 Token 预热
+
+在定时签到前 AccessTokenTTL / 2 的时段内, 按较低速率逐个刷新账号 token:
+刷新失败的账号提前标记为无效, 成功的账号缓存新的 access token。
+预热得到的 token 在签到时仍在复用时长内, 签到直接复用, 每个账号每天只轮换一次。
+
+取舍: 预热时段受 AccessTokenTTL 限制, 无法放到深夜; 时段内按 TokenSweepRate
+处理不完的账号以及分散签到中较晚执行的账号, 签到时仍会照常刷新。
+AccessTokenTTL 为 0 (每次都刷新) 时预热没有意义, 不执行。
+"""
+
+from typing import Tuple, Optional
+from datetime import datetime, timedelta
+
+from gsuid_core.logger import logger
+
+from ..tgdsign_config.tgdsign_config import TGDSignConfig
+from ..utils.rate_limit import TokenBucket
+from ..utils.token_store import REFRESH_MARGIN, refresh_locks, token_store
+from ..utils.database.models import TGDUser
+from ..utils.database.write_buffer import SignWriteBuffer
+from .sign_handler import (
+    _auto_sign_lock,
+    _iter_sign_groups,
+    _refresh_access_token,
+)
+
+
+def sweep_window(
+    now: Optional[datetime] = None,
+) -> Optional[Tuple[datetime, datetime]]:
+    """下一次定时签到前的预热时段 (开始, 签到时间), AccessTokenTTL 为 0 时返回 None"""
+    ttl_minutes = TGDSignConfig.get_config("AccessTokenTTL").data
+    if ttl_minutes <= 0:
+        return None
+    hour, minute = (int(x) for x in TGDSignConfig.get_config("SignTime").data)
+    now = now or datetime.now()
+    sign_at = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if sign_at <= now:
+        sign_at += timedelta(days=1)
+    return sign_at - timedelta(minutes=ttl_minutes // 2), sign_at
+
+
+def _fresh_at(tgd_uid: str, sign_at: datetime) -> bool:
+    """缓存的 access token 到签到时仍可复用"""
+    entry = token_store.get(tgd_uid)
+    return (
+        entry is not None
+        and entry.expires_at - REFRESH_MARGIN > sign_at.timestamp()
+    )
+
+
+async def tgd_token_sweep_task():
+    """签到前预热 Token, 到达签到时间或自动签到开始时停止"""
+    if not TGDSignConfig.get_config("TokenSweep").data:
+        return
+    window = sweep_window()
+    if window is None:
+        return
+    start, sign_at = window
+    if datetime.now() < start:
+        return
+    signin_master = TGDSignConfig.get_config("SigninMaster").data
+    if not signin_master and not TGDSignConfig.get_config("SchedSignin").data:
+        return
+
+    rate = TGDSignConfig.get_config("TokenSweepRate").data / 60
+    bucket = TokenBucket(rate, capacity=1)
+
+    checked = 0
+    failed = 0
+    logger.info("[TGDSign] 签到前Token预热开始")
+    async with SignWriteBuffer() as writer:
+        users_iter = TGDUser.iter_sign_users(switch_on_only=not signin_master)
+        async for users in _iter_sign_groups(users_iter):
+            if datetime.now() >= sign_at or _auto_sign_lock.locked():
+                logger.info("[TGDSign] Token预热: 签到已开始, 停止")
+                break
+
+            primary = users[0]
+            if _fresh_at(primary.tgd_uid, sign_at):
+                continue
+
+            await bucket.acquire()
+            async with refresh_locks.get(primary.tgd_uid):
+                # 等待期间可能已被签到刷新过
+                if _fresh_at(primary.tgd_uid, sign_at):
+                    continue
+                access_token, _ = await _refresh_access_token(primary, writer)
+            checked += 1
+            if access_token is None:
+                failed += 1
+
+    logger.info(
+        f"[TGDSign] 签到前Token预热完成: 刷新 {checked} 个账号, "
+        f"{failed} 个刷新失败"
+    )
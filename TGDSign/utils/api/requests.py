@@ -2,12 +2,15 @@
 
 import json
 import time
+import asyncio
 import traceback
 import urllib.parse as qs
-from typing import Optional
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Set, Tuple
 
 import httpx
 from gsuid_core.logger import logger
+from gsuid_core.server import on_core_shutdown
 
 from .api import (
     APPID,
@@ -43,6 +46,14 @@ from .api import (
     YIHUAN_OFFICIAL_UID,
 )
 from .calculate import aes_base64_encode, generate_sign
+from .resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    RetryPolicy,
+    is_server_failure,
+)
+from ..cache import TTLCache
+from ..rate_limit import TokenBucket
 
 
 def _get_proxy() -> Optional[str]:
@@ -52,10 +63,287 @@ def _get_proxy() -> Optional[str]:
     return proxy if proxy else None
 
 
+def _import_h2() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+HTTP2_AVAILABLE = _import_h2()
+_h2_warned = False
+
+
+def _use_http2() -> bool:
+    from ...tgdsign_config.tgdsign_config import TGDSignConfig
+
+    global _h2_warned
+    if not TGDSignConfig.get_config("ApiHttp2").data:
+        return False
+    if not HTTP2_AVAILABLE:
+        if not _h2_warned:
+            _h2_warned = True
+            logger.warning("[TGDSign] 未安装 h2，HTTP/2 未启用，安装方法: uv pip install h2")
+        return False
+    return True
+
+
+# 长连接池参数: 签到高峰期复用已建立的 TCP/TLS 连接
+POOL_LIMITS = httpx.Limits(
+    max_connections=100,
+    max_keepalive_connections=20,
+    keepalive_expiry=30,
+)
+# 代理配置变化后, 旧连接池延迟关闭, 留给在途请求完成
+POOL_RETIRE_DELAY = 210
+# 所有接口共用的重试策略
+RETRY_POLICY = RetryPolicy()
+
+
+def _log_request_error(action: str, e: Exception):
+    """网络层异常和熔断只记一行日志, 其余异常附带堆栈"""
+    logger.error(f"[TGDSign] {action}异常: {e!r}")
+    if not isinstance(e, (httpx.TransportError, CircuitOpenError)):
+        logger.error(traceback.format_exc())
+
+
+def _is_transient_error(e: Exception) -> bool:
+    """网络层异常、熔断或非 JSON 响应 (多为网关 5xx 页面), 稍后重试可能成功"""
+    return isinstance(
+        e, (httpx.TransportError, CircuitOpenError, json.JSONDecodeError)
+    )
+
+
+def _is_throttled(response: httpx.Response, resp: Optional[dict] = None) -> bool:
+    """429 或业务返回的 msg 含"频繁"均视为被服务端限流
+
+    只看 msg 字段, 公告/帖子正文中出现"频繁"不算; resp 为空时自行解析响应
+    """
+    if response.status_code == 429:
+        return True
+    if resp is None:
+        # 绝大多数响应不含"频繁", 先做子串检查, 命中时才解析 JSON
+        if "频繁" not in response.text:
+            return False
+        try:
+            resp = response.json()
+        except ValueError:
+            return False
+    if not isinstance(resp, dict):
+        return False
+    return "频繁" in str(resp.get("msg", ""))
+
+
+class RequestOutcome:
+    """一次请求的结果摘要, 供限流/统计等回调使用"""
+
+    __slots__ = ("method", "url", "elapsed", "status_code", "error", "throttled")
+
+    def __init__(
+        self,
+        method: str,
+        url: str,
+        elapsed: float,
+        response: Optional[httpx.Response] = None,
+        error: Optional[Exception] = None,
+    ):
+        self.method = method
+        self.url = url
+        self.elapsed = elapsed
+        self.status_code = response.status_code if response is not None else None
+        self.error = error
+        self.throttled = response is not None and _is_throttled(response)
+
+    @property
+    def is_overload(self) -> bool:
+        """超时、限流或 5xx, 说明服务端压力过大"""
+        if self.throttled:
+            return True
+        if self.error is not None:
+            return isinstance(self.error, httpx.TimeoutException)
+        return self.status_code is not None and self.status_code >= 500
+
+
+# 限流分组: 老虎用户中心 / 塔吉多签到与鉴权 / 塔吉多只读接口
+RATE_LIMIT_CONFIG = {
+    "laohu": "ApiRateLaohu",
+    "bbs_sign": "ApiRateSign",
+    "bbs_read": "ApiRateRead",
+}
+_SIGN_ENDPOINTS = {APPSIGNIN, GAMESIGNIN, REFRESHTOKEN, USERCENTERLOGIN}
+
+
+def _rate_limit_key(url: str) -> str:
+    if url.startswith("https://user.laohu.com/"):
+        return "laohu"
+    if url in _SIGN_ENDPOINTS:
+        return "bbs_sign"
+    return "bbs_read"
+
+
+def _token_rejected(response: httpx.Response, resp: Optional[dict] = None) -> bool:
+    """判断服务端是否拒绝了 access token (需刷新后重试)"""
+    if response.status_code in (401, 402):
+        return True
+    msg = str((resp or {}).get("msg", "")).lower()
+    return "token" in msg or "请先登录" in msg or "登录失效" in msg
+
+
 class TaygedoApi:
+    def __init__(self):
+        # 按 (代理地址, 是否 HTTP/2) 区分的共享连接池
+        self._clients: Dict[Tuple[Optional[str], bool], httpx.AsyncClient] = {}
+        self._retire_tasks: Set[asyncio.Task] = set()
+        # 已退役、等待延迟关闭的连接池, 退出时一并关闭
+        self._retired_clients: Set[httpx.AsyncClient] = set()
+        # 自定义传输层 (压测时替换为本地模拟服务), 为 None 时使用真实网络
+        self._transport: Optional[httpx.AsyncBaseTransport] = None
+        self._observers: List[Callable[[RequestOutcome], None]] = []
+        # 按接口地址区分的熔断器, 接口整体故障时快速失败
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        # 所有调用方 (手动/自动签到、登录、公告轮询) 共用的限流令牌桶
+        self._buckets: Dict[str, TokenBucket] = {
+            key: TokenBucket(0) for key in RATE_LIMIT_CONFIG
+        }
+        # 签到奖励表缓存 {(gameId, 日期): 奖励表}, 同一天内所有用户相同
+        self.signin_rewards_cache: TTLCache[dict] = TTLCache(
+            timeout=86400, maxsize=16
+        )
+
     def _get_client(self) -> httpx.AsyncClient:
-        proxy = _get_proxy()
-        return httpx.AsyncClient(timeout=200, proxy=proxy, trust_env=False)
+        key = (_get_proxy(), _use_http2())
+        client = self._clients.get(key)
+        if client is not None and not client.is_closed:
+            return client
+
+        # 配置已变化: 旧连接池退役, 新建当前配置的连接池
+        for old_key in list(self._clients):
+            if old_key != key:
+                self._retire_client(self._clients.pop(old_key))
+
+        proxy, http2 = key
+        client = httpx.AsyncClient(
+            timeout=httpx.Timeout(200, connect=10),
+            proxy=proxy if self._transport is None else None,
+            trust_env=False,
+            limits=POOL_LIMITS,
+            http2=http2,
+            transport=self._transport,
+        )
+        self._clients[key] = client
+        logger.debug(f"[TGDSign] 新建连接池 proxy={proxy} http2={http2}")
+        return client
+
+    async def set_transport(self, transport: Optional[httpx.AsyncBaseTransport]):
+        """替换底层传输层并重建连接池, 传入 None 恢复真实网络"""
+        await self.close()
+        self._transport = transport
+
+    def _retire_client(self, client: httpx.AsyncClient):
+        self._retired_clients.add(client)
+
+        async def _close_later():
+            await asyncio.sleep(POOL_RETIRE_DELAY)
+            self._retired_clients.discard(client)
+            await client.aclose()
+
+        task = asyncio.create_task(_close_later())
+        self._retire_tasks.add(task)
+        task.add_done_callback(self._retire_tasks.discard)
+
+    def add_observer(self, observer: Callable[["RequestOutcome"], None]):
+        """注册请求结果回调, 每次请求结束 (含异常) 后同步调用"""
+        self._observers.append(observer)
+
+    def _notify(self, outcome: "RequestOutcome"):
+        for observer in self._observers:
+            try:
+                observer(outcome)
+            except Exception as e:
+                logger.warning(f"[TGDSign] 请求回调异常: {e}")
+
+    async def _wait_rate_limit(self, url: str):
+        from ...tgdsign_config.tgdsign_config import TGDSignConfig
+
+        key = _rate_limit_key(url)
+        bucket = self._buckets[key]
+        bucket.set_rate(TGDSignConfig.get_config(RATE_LIMIT_CONFIG[key]).data)
+        await bucket.acquire()
+
+    def _get_breaker(self, url: str) -> CircuitBreaker:
+        breaker = self._breakers.get(url)
+        if breaker is None:
+            breaker = self._breakers[url] = CircuitBreaker()
+        return breaker
+
+    async def _request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        """发送请求: 限流 -> 熔断检查 -> 发送, 按 RETRY_POLICY 重试可安全重试的失败"""
+        breaker = self._get_breaker(url)
+        attempt = 0
+        while True:
+            attempt += 1
+            await self._wait_rate_limit(url)
+            try:
+                probe = breaker.before_request(url)
+            except CircuitOpenError as e:
+                self._notify(RequestOutcome(method, url, 0, None, e))
+                raise
+
+            client = self._get_client()
+            start = time.monotonic()
+            try:
+                response = await client.request(method, url, **kwargs)
+            except Exception as e:
+                self._notify(
+                    RequestOutcome(method, url, time.monotonic() - start, None, e)
+                )
+                if is_server_failure(error=e):
+                    breaker.record_failure()
+                if not RETRY_POLICY.should_retry(method, attempt, error=e):
+                    raise
+                delay = RETRY_POLICY.backoff(attempt)
+                logger.warning(
+                    f"[TGDSign] 请求异常 {url}: {e!r}, "
+                    f"{delay:.1f}秒后第{attempt + 1}次尝试"
+                )
+                await asyncio.sleep(delay)
+                continue
+            else:
+                self._notify(
+                    RequestOutcome(method, url, time.monotonic() - start, response)
+                )
+                if is_server_failure(response=response):
+                    breaker.record_failure()
+                else:
+                    breaker.record_success()
+            finally:
+                # 被取消或非网络层异常时不会记录成功/失败, 这里兜底释放探测名额
+                if probe:
+                    breaker.release_probe()
+
+            if not RETRY_POLICY.should_retry(method, attempt, response=response):
+                return response
+            delay = RETRY_POLICY.backoff(attempt)
+            logger.warning(
+                f"[TGDSign] 请求 {url} 返回 {response.status_code}, "
+                f"{delay:.1f}秒后第{attempt + 1}次尝试"
+            )
+            await asyncio.sleep(delay)
+
+    async def close(self):
+        """关闭所有连接池 (插件/核心退出时调用)"""
+        # 取消延迟关闭任务, 其连接池在下面直接关闭
+        for task in list(self._retire_tasks):
+            task.cancel()
+        clients = [*self._clients.values(), *self._retired_clients]
+        self._clients.clear()
+        self._retired_clients.clear()
+        for client in clients:
+            try:
+                await client.aclose()
+            except Exception as e:
+                logger.warning(f"[TGDSign] 关闭连接池异常: {e}")
 
     async def send_captcha(self, phone: str, device_id: str):
         data = {
@@ -79,10 +367,9 @@ class TaygedoApi:
         headers = {**REQUEST_HEADERS_BASE}
 
         try:
-            async with self._get_client() as client:
-                response = await client.post(
-                    SENDCAPTCHA, content=payload, headers=headers
-                )
+            response = await self._request(
+                "POST", SENDCAPTCHA, content=payload, headers=headers
+            )
             resp = response.json()
             logger.debug(f"[TGDSign] 发送验证码响应: {resp}")
             if (
@@ -95,8 +382,7 @@ class TaygedoApi:
                 logger.error(f"[TGDSign] 发送验证码失败: {resp}")
                 return {"status": False, "message": resp.get("message", "未知错误")}
         except Exception as e:
-            logger.error(f"[TGDSign] 发送验证码异常: {e}")
-            logger.error(traceback.format_exc())
+            _log_request_error("发送验证码", e)
             return {"status": False, "message": "发送验证码失败，详情请查看日志"}
 
     async def check_captcha(self, phone: str, captcha: str, device_id: str):
@@ -120,10 +406,9 @@ class TaygedoApi:
         headers = {**REQUEST_HEADERS_BASE}
 
         try:
-            async with self._get_client() as client:
-                response = await client.post(
-                    CHECKCAPTCHA, content=payload, headers=headers
-                )
+            response = await self._request(
+                "POST", CHECKCAPTCHA, content=payload, headers=headers
+            )
             resp = response.json()
             logger.debug(f"[TGDSign] 验证验证码响应: {resp}")
             if (
@@ -139,8 +424,7 @@ class TaygedoApi:
                     msg = "短信正在发送，请等待几分钟后再试"
                 return {"status": False, "message": msg}
         except Exception as e:
-            logger.error(f"[TGDSign] 验证验证码异常: {e}")
-            logger.error(traceback.format_exc())
+            _log_request_error("验证验证码", e)
             return {"status": False, "message": "验证验证码失败，详情请查看日志"}
 
     async def login(self, phone: str, captcha: str, device_id: str):
@@ -172,10 +456,9 @@ class TaygedoApi:
         headers = {**REQUEST_HEADERS_BASE}
 
         try:
-            async with self._get_client() as client:
-                response = await client.post(
-                    LOGIN, content=payload, headers=headers
-                )
+            response = await self._request(
+                "POST", LOGIN, content=payload, headers=headers
+            )
             resp = response.json()
             logger.debug(f"[TGDSign] 登录响应: {resp}")
             if (
@@ -192,8 +475,7 @@ class TaygedoApi:
                 logger.error(f"[TGDSign] 登录失败: {resp}")
                 return {"status": False, "message": resp.get("message", "登录失败")}
         except Exception as e:
-            logger.error(f"[TGDSign] 登录异常: {e}")
-            logger.error(traceback.format_exc())
+            _log_request_error("登录", e)
             return {"status": False, "message": "登录失败，详情请查看日志"}
 
     async def user_center_login(self, token: str, user_id: str, device_id: str):
@@ -213,10 +495,9 @@ class TaygedoApi:
         }
 
         try:
-            async with self._get_client() as client:
-                response = await client.post(
-                    USERCENTERLOGIN, content=payload, headers=headers
-                )
+            response = await self._request(
+                "POST", USERCENTERLOGIN, content=payload, headers=headers
+            )
             resp = response.json()
             logger.debug(f"[TGDSign] 用户中心登录响应: {resp}")
             if (
@@ -233,8 +514,7 @@ class TaygedoApi:
                 logger.error(f"[TGDSign] 用户中心登录失败: {resp}")
                 return {"status": False, "message": resp.get("msg", "用户中心登录失败")}
         except Exception as e:
-            logger.error(f"[TGDSign] 用户中心登录异常: {e}")
-            logger.error(traceback.format_exc())
+            _log_request_error("用户中心登录", e)
             return {"status": False, "message": "用户中心登录失败，详情请查看日志"}
 
     async def refresh_token(self, refresh_token: str, device_id: str):
@@ -248,8 +528,7 @@ class TaygedoApi:
         }
 
         try:
-            async with self._get_client() as client:
-                response = await client.post(REFRESHTOKEN, headers=headers)
+            response = await self._request("POST", REFRESHTOKEN, headers=headers)
             if not response.text:
                 logger.error(
                     f"[TGDSign] 刷新token空响应: "
@@ -274,22 +553,29 @@ class TaygedoApi:
                 }
             else:
                 logger.error(f"[TGDSign] 刷新token失败: {resp}")
-                return {"status": False, "message": resp.get("msg", "刷新token失败")}
+                return {
+                    "status": False,
+                    "message": resp.get("msg", "刷新token失败"),
+                    "rate_limited": _is_throttled(response, resp),
+                }
         except Exception as e:
-            logger.error(f"[TGDSign] 刷新token异常: {e}")
-            logger.error(traceback.format_exc())
-            return {"status": False, "message": "刷新token失败，详情请查看日志"}
+            _log_request_error("刷新token", e)
+            return {
+                "status": False,
+                "message": "刷新token失败，详情请查看日志",
+                "network": _is_transient_error(e),
+            }
 
     async def get_bind_role(self, access_token: str, uid: str, game_id: str = GAMEID_HT):
         headers = {"Authorization": access_token}
 
         try:
-            async with self._get_client() as client:
-                response = await client.get(
-                    GETBINDROLE,
-                    headers=headers,
-                    params={"uid": uid, "gameId": game_id},
-                )
+            response = await self._request(
+                "GET",
+                GETBINDROLE,
+                headers=headers,
+                params={"uid": uid, "gameId": game_id},
+            )
             resp = response.json()
             logger.info(f"[TGDSign] 获取绑定角色响应: {resp}")
             if (
@@ -309,8 +595,7 @@ class TaygedoApi:
                     "message": resp.get("msg", "获取绑定角色失败"),
                 }
         except Exception as e:
-            logger.error(f"[TGDSign] 获取绑定角色异常: {e}")
-            logger.error(traceback.format_exc())
+            _log_request_error("获取绑定角色", e)
             return {"status": False, "message": "获取绑定角色失败，详情请查看日志"}
 
     async def get_game_roles(
@@ -330,12 +615,12 @@ class TaygedoApi:
         }
 
         try:
-            async with self._get_client() as client:
-                response = await client.get(
-                    GETGAMEROLES,
-                    headers=headers,
-                    params={"gameId": game_id},
-                )
+            response = await self._request(
+                "GET",
+                GETGAMEROLES,
+                headers=headers,
+                params={"gameId": game_id},
+            )
             resp = response.json()
             logger.info(f"[TGDSign] 获取游戏角色列表响应: {resp}")
             if (
@@ -354,8 +639,7 @@ class TaygedoApi:
                     "message": resp.get("msg", "获取游戏角色列表失败"),
                 }
         except Exception as e:
-            logger.error(f"[TGDSign] 获取游戏角色列表异常: {e}")
-            logger.error(traceback.format_exc())
+            _log_request_error("获取游戏角色列表", e)
             return {"status": False, "message": "获取游戏角色列表失败，详情请查看日志"}
 
     async def app_signin(self, access_token: str, uid: str, device_id: str):
@@ -371,10 +655,15 @@ class TaygedoApi:
         }
 
         try:
-            async with self._get_client() as client:
-                response = await client.post(
-                    APPSIGNIN, content=payload, headers=headers
-                )
+            response = await self._request(
+                "POST", APPSIGNIN, content=payload, headers=headers
+            )
+            if not response.text and _token_rejected(response):
+                return {
+                    "status": False,
+                    "message": "AccessToken已失效",
+                    "token_expired": True,
+                }
             resp = response.json()
             logger.debug(f"[TGDSign] APP签到响应: {resp}")
             if (
@@ -393,11 +682,19 @@ class TaygedoApi:
                     logger.debug(f"[TGDSign] APP签到: {resp}")
                 else:
                     logger.error(f"[TGDSign] APP签到失败: {resp}")
-                return {"status": False, "message": msg}
+                return {
+                    "status": False,
+                    "message": msg,
+                    "token_expired": _token_rejected(response, resp),
+                    "rate_limited": _is_throttled(response, resp),
+                }
         except Exception as e:
-            logger.error(f"[TGDSign] APP签到异常: {e}")
-            logger.error(traceback.format_exc())
-            return {"status": False, "message": "APP签到失败，详情请查看日志"}
+            _log_request_error("APP签到", e)
+            return {
+                "status": False,
+                "message": "APP签到失败，详情请查看日志",
+                "network": _is_transient_error(e),
+            }
 
     async def game_signin(
         self,
@@ -410,10 +707,15 @@ class TaygedoApi:
         headers = {**REQUEST_HEADERS_BASE, "authorization": access_token}
 
         try:
-            async with self._get_client() as client:
-                response = await client.post(
-                    GAMESIGNIN, content=payload, headers=headers
-                )
+            response = await self._request(
+                "POST", GAMESIGNIN, content=payload, headers=headers
+            )
+            if not response.text and _token_rejected(response):
+                return {
+                    "status": False,
+                    "message": "AccessToken已失效",
+                    "token_expired": True,
+                }
             resp = response.json()
             logger.debug(f"[TGDSign] 游戏签到响应: {resp}")
             if (
@@ -428,22 +730,36 @@ class TaygedoApi:
                     logger.debug(f"[TGDSign] 游戏签到: {resp}")
                 else:
                     logger.error(f"[TGDSign] 游戏签到失败: {resp}")
-                return {"status": False, "message": msg}
+                return {
+                    "status": False,
+                    "message": msg,
+                    "token_expired": _token_rejected(response, resp),
+                    "rate_limited": _is_throttled(response, resp),
+                }
         except Exception as e:
-            logger.error(f"[TGDSign] 游戏签到异常: {e}")
-            logger.error(traceback.format_exc())
-            return {"status": False, "message": "游戏签到失败，详情请查看日志"}
+            _log_request_error("游戏签到", e)
+            return {
+                "status": False,
+                "message": "游戏签到失败，详情请查看日志",
+                "network": _is_transient_error(e),
+            }
 
     async def get_signin_state(self, access_token: str, game_id: str = GAMEID_HT):
         headers = {"Authorization": access_token}
 
         try:
-            async with self._get_client() as client:
-                response = await client.get(
-                    GETSIGNINSTATE,
-                    headers=headers,
-                    params={"gameId": game_id},
-                )
+            response = await self._request(
+                "GET",
+                GETSIGNINSTATE,
+                headers=headers,
+                params={"gameId": game_id},
+            )
+            if not response.text and _token_rejected(response):
+                return {
+                    "status": False,
+                    "message": "AccessToken已失效",
+                    "token_expired": True,
+                }
             resp = response.json()
             logger.debug(f"[TGDSign] 获取签到状态响应: {resp}")
             if (
@@ -461,22 +777,60 @@ class TaygedoApi:
                 return {
                     "status": False,
                     "message": resp.get("msg", "获取签到状态失败"),
+                    "token_expired": _token_rejected(response, resp),
                 }
         except Exception as e:
-            logger.error(f"[TGDSign] 获取签到状态异常: {e}")
-            logger.error(traceback.format_exc())
+            _log_request_error("获取签到状态", e)
             return {"status": False, "message": "获取签到状态失败，详情请查看日志"}
 
-    async def get_signin_rewards(self, access_token: str, game_id: str = GAMEID_HT):
+    async def get_signin_rewards(
+        self,
+        access_token: str,
+        game_id: str = GAMEID_HT,
+        is_cache: bool = False,
+    ):
+        """获取签到奖励表
+
+        奖励表同一游戏同一天对所有用户相同, is_cache 时按 (gameId, 日期)
+        缓存, 并发请求只会有一个真正发出
+        """
+        if not is_cache:
+            return await self._fetch_signin_rewards(access_token, game_id)
+
+        key = (game_id, datetime.now().strftime("%Y-%m-%d"))
+        failed: Optional[dict] = None
+
+        async def _load() -> Optional[dict]:
+            nonlocal failed
+            res = await self._fetch_signin_rewards(access_token, game_id)
+            if not res["status"]:
+                failed = res
+                return None
+            logger.debug(f"[TGDSign] 已缓存签到奖励表 gameId={game_id}")
+            return res
+
+        res = await self.signin_rewards_cache.get_or_set(key, _load)
+        if res is None:
+            # 失败结果不缓存; 合并等待的调用方拿不到 failed 时返回通用错误
+            return failed or {"status": False, "message": "获取签到奖励失败"}
+        return res
+
+    async def _fetch_signin_rewards(self, access_token: str, game_id: str):
         headers = {"Authorization": access_token}
 
         try:
-            async with self._get_client() as client:
-                response = await client.get(
-                    GETSIGNINREWARDS,
-                    headers=headers,
-                    params={"gameId": game_id},
-                )
+            response = await self._request(
+                "GET",
+                GETSIGNINREWARDS,
+                headers=headers,
+                params={"gameId": game_id},
+            )
+            if not response.text and _token_rejected(response):
+                return {
+                    "status": False,
+                    "message": "AccessToken已失效",
+                    "token_expired": True,
+                }
             resp = response.json()
             logger.debug(f"[TGDSign] 获取签到奖励响应: {resp}")
             if (
@@ -494,20 +848,21 @@ class TaygedoApi:
                 return {
                     "status": False,
                     "message": resp.get("msg", "获取签到奖励失败"),
+                    "token_expired": _token_rejected(response, resp),
                 }
         except Exception as e:
-            logger.error(f"[TGDSign] 获取签到奖励异常: {e}")
-            logger.error(traceback.format_exc())
+            _log_request_error("获取签到奖励", e)
             return {"status": False, "message": "获取签到奖励失败，详情请查看日志"}
 
 
     # ===================== 论坛公告（无需鉴权） =====================
 
-    # 列表缓存（全局，进程内）
-    ann_list_data: list = []
-    ann_list_cache_time: float = 0
-    ann_map: dict = {}
+    # 列表 / 详情缓存（全局，进程内）
     ANN_LIST_CACHE_DURATION = 600  # 10 分钟
+    ann_list_cache: TTLCache[list] = TTLCache(
+        timeout=ANN_LIST_CACHE_DURATION, maxsize=4
+    )
+    ann_map: TTLCache[dict] = TTLCache(timeout=86400, maxsize=256)
 
     async def get_ann_list(
         self,
@@ -521,26 +876,20 @@ class TaygedoApi:
           id, subject, content, createTime, sendTime, cover, region,
           likeNum, commentNum, collectNum, images, vods
         """
-        current_time = time.time()
-        cache_valid = (
-            self.ann_list_data
-            and (current_time - self.ann_list_cache_time)
-            < self.ANN_LIST_CACHE_DURATION
-        )
-        if is_cache and cache_valid:
-            logger.debug(
-                f"[TGDSign][Ann] 使用缓存列表（距上次 "
-                f"{int(current_time - self.ann_list_cache_time)} 秒）"
-            )
-            return self.ann_list_data
+        cache_key = (uid, count)
+        if is_cache:
+            cached = self.ann_list_cache.get(cache_key)
+            if cached:
+                logger.debug("[TGDSign][Ann] 使用缓存列表")
+                return cached
 
         try:
-            async with self._get_client() as client:
-                resp = await client.get(
-                    GETUSERPOSTLIST,
-                    params={"uid": uid, "count": count, "version": 0},
-                    headers=WEB_HEADERS_BASE,
-                )
+            resp = await self._request(
+                "GET",
+                GETUSERPOSTLIST,
+                params={"uid": uid, "count": count, "version": 0},
+                headers=WEB_HEADERS_BASE,
+            )
             body = resp.json()
         except Exception as e:
             logger.error(f"[TGDSign][Ann] 获取公告列表异常: {e}")
@@ -586,24 +935,25 @@ class TaygedoApi:
                 "communityId": p.get("communityId"),
             })
 
-        self.ann_list_data = result
-        self.ann_list_cache_time = current_time
+        if result:
+            self.ann_list_cache.set(cache_key, result)
         logger.info(f"[TGDSign][Ann] 获取到 {len(result)} 条公告")
         return result
 
     async def get_ann_detail(self, post_id) -> Optional[dict]:
         """拉取单篇帖子详情（富文本 content 是 HTML，structuredContent 是顺序片段）。"""
         pid = str(post_id)
-        if pid in self.ann_map:
-            return self.ann_map[pid]
+        cached = self.ann_map.get(pid)
+        if cached is not None:
+            return cached
 
         try:
-            async with self._get_client() as client:
-                resp = await client.get(
-                    GETPOSTFULL,
-                    params={"postId": pid},
-                    headers=WEB_HEADERS_BASE,
-                )
+            resp = await self._request(
+                "GET",
+                GETPOSTFULL,
+                params={"postId": pid},
+                headers=WEB_HEADERS_BASE,
+            )
             body = resp.json()
         except Exception as e:
             logger.error(f"[TGDSign][Ann] 获取详情异常 id={post_id}: {e}")
@@ -638,7 +988,7 @@ class TaygedoApi:
             "images": post.get("images") or [],
             "vods": post.get("vods") or [],
         }
-        self.ann_map[pid] = result
+        self.ann_map.set(pid, result)
         return result
 
 
@@ -653,3 +1003,8 @@ def _first_line(text: str, maxlen: int = 60) -> str:
 
 
 tgd_api = TaygedoApi()
+
+
+@on_core_shutdown
+async def _close_tgd_api():
+    await tgd_api.close()
@@ -0,0 +1,114 @@
+"""请求重试与熔断策略"""
+
+import time
+import random
+from typing import Optional
+
+import httpx
+
+# 请求未发出 (建连阶段失败), 任何方法都可以安全重试
+CONNECT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+# 幂等请求可重试的响应状态码
+RETRY_STATUS = {429, 500, 502, 503, 504}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+
+class CircuitOpenError(Exception):
+    """接口处于熔断状态, 请求未发出"""
+
+    def __init__(self, url: str, retry_after: float):
+        super().__init__(f"接口熔断中, {retry_after:.0f}秒后重试: {url}")
+        self.url = url
+        self.retry_after = retry_after
+
+
+class RetryPolicy:
+    def __init__(
+        self,
+        max_attempts: int = 3,
+        base_delay: float = 0.5,
+        max_delay: float = 8.0,
+    ):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def should_retry(
+        self,
+        method: str,
+        attempt: int,
+        response: Optional[httpx.Response] = None,
+        error: Optional[Exception] = None,
+    ) -> bool:
+        """attempt 从 1 开始; 非幂等请求只在建连失败时重试, 避免重复签到/轮换 token"""
+        if attempt >= self.max_attempts:
+            return False
+        if error is not None:
+            if isinstance(error, CONNECT_ERRORS):
+                return True
+            return method in IDEMPOTENT_METHODS and isinstance(
+                error, httpx.TransportError
+            )
+        if response is not None and method in IDEMPOTENT_METHODS:
+            return response.status_code in RETRY_STATUS
+        return False
+
+    def backoff(self, attempt: int) -> float:
+        """指数退避 + 全抖动"""
+        delay = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        return random.uniform(0, delay)
+
+
+class CircuitBreaker:
+    """单个接口的熔断器
+
+    连续失败 threshold 次后打开, cooldown 秒内直接拒绝请求;
+    冷却结束后放行一个探测请求, 成功则关闭, 失败则重新打开。
+    """
+
+    def __init__(self, threshold: int = 5, cooldown: float = 30.0):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probing = False
+
+    @property
+    def is_open(self) -> bool:
+        return self.opened_at is not None
+
+    def before_request(self, url: str) -> bool:
+        """熔断中时抛出 CircuitOpenError; 返回本次请求是否为探测请求"""
+        if self.opened_at is None:
+            return False
+        remaining = self.opened_at + self.cooldown - time.monotonic()
+        if remaining > 0 or self._probing:
+            raise CircuitOpenError(url, max(remaining, 0))
+        self._probing = True
+        return True
+
+    def release_probe(self):
+        """探测请求结束但未记录成功/失败 (被取消或非网络层异常) 时释放探测名额,
+        否则熔断器会一直拒绝请求"""
+        self._probing = False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self._probing or self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
+        self._probing = False
+
+
+def is_server_failure(
+    response: Optional[httpx.Response] = None,
+    error: Optional[Exception] = None,
+) -> bool:
+    """计入熔断的失败: 网络层异常或 5xx, 业务错误 (4xx / code != 0) 不计入"""
+    if error is not None:
+        return isinstance(error, httpx.TransportError)
+    return response is not None and response.status_code >= 500
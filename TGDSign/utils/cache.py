@@ -1,39 +1,125 @@
 import time
+import heapq
 from collections import OrderedDict
+from typing import (
+    Any,
+    List,
+    Tuple,
+    Generic,
+    TypeVar,
+    Callable,
+    Hashable,
+    Optional,
+    Awaitable,
+)
 
+from .keyed_lock import SingleFlight
 
-class TimedCache:
-    def __init__(self, timeout=5, maxsize=10):
-        self.cache = OrderedDict()
+V = TypeVar("V")
+
+_MISSING = object()
+
+
+class TTLCache(Generic[V]):
+    """带过期时间的 LRU 缓存
+
+    - get / set 均摊 O(1): OrderedDict 维护访问顺序, 命中时 move_to_end
+    - 过期: 堆中按到期时间记录, 读写时惰性弹出已到期的键, 不做全表扫描
+    - 超出 maxsize 时淘汰最久未访问的键
+    - get_or_set 对同一个键的并发加载只执行一次
+    """
+
+    def __init__(self, timeout: float = 5, maxsize: int = 10):
         self.timeout = timeout
         self.maxsize = maxsize
+        # {key: (value, 到期时间)}
+        self.cache: "OrderedDict[Hashable, Tuple[V, float]]" = OrderedDict()
+        # [(到期时间, key)], 键被覆盖后旧记录留在堆中, 弹出时比对到期时间跳过
+        self._expiry: List[Tuple[float, int, Hashable]] = []
+        self._seq = 0
+        self._flights = SingleFlight()
+        self.hits = 0
+        self.misses = 0
 
-    def set(self, key, value):
-        if len(self.cache) >= self.maxsize:
-            self._clean_up()
-        if key in self.cache:
-            self.cache.move_to_end(key)
-        else:
-            self._clean_up()
-        self.cache[key] = (value, time.time() + self.timeout)
+    def __len__(self) -> int:
+        return len(self.cache)
 
-    def get(self, key):
-        if key in self.cache:
-            value, expiry = self.cache.pop(key)
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        item = self.cache.get(key)
+        if item is not None:
+            value, expiry = item
             if time.time() < expiry:
-                self.cache[key] = (value, expiry)
+                self.cache.move_to_end(key)
+                self.hits += 1
                 return value
-        return None
+            del self.cache[key]
+        self.misses += 1
+        return default
 
-    def delete(self, key):
+    def set(self, key: Hashable, value: V, timeout: Optional[float] = None):
+        expiry = time.time() + (self.timeout if timeout is None else timeout)
         if key in self.cache:
-            del self.cache[key]
+            self.cache.move_to_end(key)
+        self.cache[key] = (value, expiry)
+        self._seq += 1
+        heapq.heappush(self._expiry, (expiry, self._seq, key))
 
-    def _clean_up(self):
-        current_time = time.time()
-        keys_to_delete = []
-        for key, (value, expiry_time) in self.cache.items():
-            if expiry_time <= current_time:
-                keys_to_delete.append(key)
-        for key in keys_to_delete:
-            del self.cache[key]
+        self._evict_expired()
+        while len(self.cache) > self.maxsize:
+            self.cache.popitem(last=False)
+        # 覆盖写入积累的过期记录过多时重建堆
+        if len(self._expiry) > 2 * len(self.cache) + 64:
+            self._rebuild_heap()
+
+    def delete(self, key: Hashable):
+        self.cache.pop(key, None)
+
+    def clear(self):
+        self.cache.clear()
+        self._expiry.clear()
+
+    async def get_or_set(
+        self,
+        key: Hashable,
+        loader: Callable[[], Awaitable[Optional[V]]],
+        timeout: Optional[float] = None,
+    ) -> Optional[V]:
+        """未命中时调用 loader 加载并写入缓存, loader 返回 None 时不缓存"""
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        async def _load() -> Optional[V]:
+            # 排队期间可能已被其他调用写入
+            cached = self.cache.get(key)
+            if cached is not None and time.time() < cached[1]:
+                return cached[0]
+            result = await loader()
+            if result is not None:
+                self.set(key, result, timeout)
+            return result
+
+        return await self._flights.run(key, _load)
+
+    def _evict_expired(self):
+        now = time.time()
+        heap = self._expiry
+        while heap and heap[0][0] <= now:
+            expiry, _, key = heapq.heappop(heap)
+            item = self.cache.get(key)
+            if item is not None and item[1] == expiry:
+                del self.cache[key]
+
+    def _rebuild_heap(self):
+        self._expiry = []
+        for key, (_, expiry) in self.cache.items():
+            self._seq += 1
+            self._expiry.append((expiry, self._seq, key))
+        heapq.heapify(self._expiry)
+
+
+# 兼容旧名称
+TimedCache = TTLCache
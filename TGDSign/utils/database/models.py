@@ -1,12 +1,38 @@
 """TGDSign 数据库模型"""
 
-from typing import Any, Dict, List, Type, TypeVar, Optional
+import time
+from typing import (
+    Any,
+    Set,
+    Dict,
+    List,
+    Type,
+    Tuple,
+    TypeVar,
+    Callable,
+    Optional,
+    AsyncIterator,
+)
 from datetime import datetime
 
 from sqlmodel import Field, select
-from sqlalchemy import delete, or_, update
+from sqlalchemy import (
+    Index,
+    Table,
+    or_,
+    and_,
+    case,
+    func,
+    delete,
+    update,
+    inspect,
+    bindparam,
+)
+from sqlalchemy.sql import Executable
 from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel as PydanticBaseModel
+from gsuid_core.logger import logger
+from gsuid_core.server import on_core_start
 from gsuid_core.utils.database.base_models import (
     Bind,
     User,
@@ -26,19 +52,190 @@ exec_list.extend(
 T_TGDBind = TypeVar("T_TGDBind", bound="TGDBind")
 T_TGDUser = TypeVar("T_TGDUser", bound="TGDUser")
 T_TGDSignRecord = TypeVar("T_TGDSignRecord", bound="TGDSignRecord")
+T_TGDSignRun = TypeVar("T_TGDSignRun", bound="TGDSignRun")
+T_TGDSignJournal = TypeVar("T_TGDSignJournal", bound="TGDSignJournal")
+
+UPSERT_CHUNK = 200
 
 
 def get_today_date() -> str:
     return datetime.now().strftime("%Y-%m-%d")
 
 
+# 已检查过的唯一键 {(表名, 列): 是否存在}, 存在时才使用原生 upsert
+_unique_keys: Dict[Tuple[str, Tuple[str, ...]], bool] = {}
+
+
+def _find_unique_index(sync_conn, table_name: str, columns: List[str]) -> bool:
+    insp = inspect(sync_conn)
+    if not insp.has_table(table_name):
+        return False
+    return any(
+        index.get("unique") and list(index["column_names"]) == columns
+        for index in insp.get_indexes(table_name)
+    )
+
+
+async def _has_unique_key(
+    session: AsyncSession,
+    table: Table,
+    columns: List[str],
+) -> bool:
+    """数据库中是否已有 columns 上的唯一索引, 每个进程每个键只查询一次"""
+    key = (table.name, tuple(columns))
+    if key not in _unique_keys:
+        conn = await session.connection()
+        _unique_keys[key] = await conn.run_sync(
+            _find_unique_index, table.name, columns
+        )
+    return _unique_keys[key]
+
+
+async def _build_upsert(
+    session: AsyncSession,
+    table: Table,
+    rows: List[Dict[str, Any]],
+    conflict_cols: List[str],
+    build_set: Callable[[Any], Dict[str, Any]],
+) -> Optional[Executable]:
+    """按数据库方言构造单语句 upsert, 不支持的方言或唯一索引尚未建立时返回 None
+
+    build_set 接收"待插入行"的列集合 (excluded / inserted), 返回冲突时要更新的列
+    """
+    dialect = session.get_bind().dialect.name
+    if dialect not in ("sqlite", "postgresql", "mysql", "mariadb"):
+        return None
+    # 没有唯一索引时 MySQL 的 ON DUPLICATE KEY 退化为普通 INSERT, 会写出重复行
+    if not await _has_unique_key(session, table, conflict_cols):
+        return None
+
+    if dialect in ("sqlite", "postgresql"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        stmt = insert(table).values(rows)
+        return stmt.on_conflict_do_update(
+            index_elements=conflict_cols,
+            set_=build_set(stmt.excluded),
+        )
+
+    from sqlalchemy.dialects.mysql import insert
+
+    stmt = insert(table).values(rows)
+    return stmt.on_duplicate_key_update(**build_set(stmt.inserted))
+
+
+def _dedupe_users(sync_conn, table: Table) -> int:
+    """建立 (user_id, bot_id, uid) 唯一索引前清理 TGDUser 重复行, 返回删除行数
+
+    旧版本没有角色时 uid 留空, 同一用户绑定的多个账号会落在同一个
+    (user_id, bot_id, "") 组里; 先按现行写法把空 uid 补为 tgd_uid,
+    再只删除 tgd_uid 也相同的行 (同一账号的重复记录), 保留最新一条。
+    不同账号共用同一 uid 的情况不删除, 唯一索引建立失败, 写入回退为先查后写。
+    """
+    c = table.c
+    sync_conn.execute(
+        update(table)
+        .where(c.uid == "", c.tgd_uid != "")
+        .values(uid=c.tgd_uid)
+    )
+
+    key_cols = [c.user_id, c.bot_id, c.uid, c.tgd_uid]
+    groups = sync_conn.execute(
+        select(*key_cols, func.max(c.id))
+        .group_by(*key_cols)
+        .having(func.count() > 1)
+    ).all()
+    removed = 0
+    for *key, keep_id in groups:
+        result = sync_conn.execute(
+            delete(table).where(
+                *[col == value for col, value in zip(key_cols, key)],
+                c.id != keep_id,
+            )
+        )
+        removed += result.rowcount
+    return removed
+
+
+def _dedupe_sign_records(sync_conn, table: Table) -> int:
+    """建立 (uid, date) 唯一索引前合并 TGDSignRecord 重复行, 返回删除行数
+
+    保留每组 id 最小的一行, 签到标记取组内最大值后再删除其余行,
+    避免已签到的标记被丢弃、账号被当作未签到重复签到
+    """
+    c = table.c
+    groups = sync_conn.execute(
+        select(
+            c.uid,
+            c.date,
+            func.min(c.id),
+            func.max(c.app_sign),
+            func.max(c.game_sign),
+        )
+        .group_by(c.uid, c.date)
+        .having(func.count() > 1)
+    ).all()
+    removed = 0
+    for uid, date, keep_id, app_sign, game_sign in groups:
+        sync_conn.execute(
+            update(table)
+            .where(c.id == keep_id)
+            .values(app_sign=app_sign, game_sign=game_sign)
+        )
+        result = sync_conn.execute(
+            delete(table).where(c.uid == uid, c.date == date, c.id != keep_id)
+        )
+        removed += result.rowcount
+    return removed
+
+
+def _ensure_indexes(
+    sync_conn,
+    table: Table,
+    dedupe: Callable[[Any, Table], int],
+):
+    """补建模型中声明但数据库中缺失的索引
+
+    唯一索引建立前先用 dedupe 清理重复行, 索引建好后不会再次清理。
+    索引 DDL 由 SQLAlchemy 按方言生成, 不依赖 IF NOT EXISTS。
+    """
+    insp = inspect(sync_conn)
+    if not insp.has_table(table.name):
+        return
+    existing = {index["name"] for index in insp.get_indexes(table.name)}
+    for index in table.indexes:
+        if index.name in existing:
+            continue
+        if index.unique:
+            columns = [c.name for c in index.columns]
+            if _find_unique_index(sync_conn, table.name, columns):
+                continue
+            removed = dedupe(sync_conn, table)
+            if removed:
+                logger.info(
+                    f"[TGDSign] 建立唯一索引 {index.name} 前清理 {table.name} "
+                    f"重复行 {removed} 条"
+                )
+        index.create(sync_conn)
+        logger.info(f"[TGDSign] 已建立索引 {index.name}")
+        if index.unique:
+            key = (table.name, tuple(c.name for c in index.columns))
+            _unique_keys[key] = True
+
+
 class TGDBind(Bind, table=True):
     __table_args__: Dict[str, Any] = {"extend_existing": True}
     uid: Optional[str] = Field(default=None, title="塔吉多角色ID")
 
 
 class TGDUser(User, table=True):
-    __table_args__: Dict[str, Any] = {"extend_existing": True}
+    __table_args__: Tuple[Any, ...] = (
+        Index("ix_tgduser_tgd_uid", "tgd_uid"),
+        Index("ux_tgduser_user_bot_uid", "user_id", "bot_id", "uid", unique=True),
+        {"extend_existing": True},
+    )
     cookie: str = Field(default="", title="RefreshToken")
     uid: str = Field(default="", title="塔吉多角色ID")
     tgd_uid: str = Field(default="", title="塔吉多UID")
@@ -47,6 +244,13 @@ class TGDUser(User, table=True):
     game_id: str = Field(default="1256", title="游戏ID")
     token_valid: str = Field(default="", title="Token有效性")
 
+    @classmethod
+    @with_session
+    async def ensure_indexes(cls: Type[T_TGDUser], session: AsyncSession):
+        """补建缺失的索引, 同一账号的重复记录保留最新一条"""
+        conn = await session.connection()
+        await conn.run_sync(_ensure_indexes, cls.__table__, _dedupe_users)
+
     @classmethod
     @with_session
     async def insert_data(
@@ -56,12 +260,116 @@ class TGDUser(User, table=True):
         bot_id: str,
         **data,
     ) -> int:
-        """覆写基类方法, 按 (user_id, bot_id, uid) 查重/更新,
+        """覆写基类方法, 按 (user_id, bot_id, uid) 唯一键 upsert,
         并在写入有角色ID的记录后清理同tgd_uid下角色ID为空的记录"""
-        uid = data.get("uid", "")
-        tgd_uid = data.get("tgd_uid", "")
+        await cls._upsert_users(session, user_id, bot_id, [data])
+        return 0
 
-        # 按 (user_id, bot_id, uid) 精确查重
+    @classmethod
+    @with_session
+    async def bind_roles(
+        cls: Type[T_TGDUser],
+        session: AsyncSession,
+        user_id: str,
+        bot_id: str,
+        group_id: Optional[str],
+        users: List[Dict[str, Any]],
+    ):
+        """登录后在同一事务中写入绑定和所有角色记录
+
+        角色ID按顺序合并进 TGDBind.uid (已存在的保持原位),
+        users 为各角色的 TGDUser 字段
+        """
+        if not users:
+            return
+
+        uids = [u["uid"] for u in users]
+        result = await session.execute(
+            select(TGDBind).where(
+                TGDBind.user_id == user_id, TGDBind.bot_id == bot_id
+            )
+        )
+        bind = result.scalars().first()
+        if bind is None:
+            session.add(
+                TGDBind(
+                    user_id=user_id,
+                    bot_id=bot_id,
+                    group_id=group_id,
+                    uid="_".join(dict.fromkeys(uids)),
+                )
+            )
+        else:
+            existing = [u for u in (bind.uid or "").split("_") if u]
+            bind.uid = "_".join(dict.fromkeys(existing + uids))
+            if group_id:
+                bind.group_id = group_id
+
+        await cls._upsert_users(session, user_id, bot_id, users)
+
+    @classmethod
+    async def _upsert_users(
+        cls,
+        session: AsyncSession,
+        user_id: str,
+        bot_id: str,
+        data_list: List[Dict[str, Any]],
+    ):
+        """按 (user_id, bot_id, uid) 唯一键单语句批量 upsert,
+        并在写入有角色ID的记录后清理同tgd_uid下角色ID为空的记录"""
+        table = cls.__table__
+        keys = {k for data in data_list for k in data if k in table.c}
+        rows = [
+            cls(user_id=user_id, bot_id=bot_id, **data).model_dump(exclude={"id"})
+            for data in data_list
+        ]
+        stmt = await _build_upsert(
+            session,
+            table,
+            rows,
+            ["user_id", "bot_id", "uid"],
+            lambda new: {k: new[k] for k in keys},
+        )
+        if stmt is not None:
+            await session.execute(stmt)
+        else:
+            for data in data_list:
+                await cls._select_then_upsert(
+                    session, user_id, bot_id, data.get("uid", ""), data
+                )
+
+        # 成功写入具有角色ID的记录后, 删除同账号同tgd_uid下角色ID为空的记录
+        # 先用只读查询确认存在, 避免每次登录都申请写锁执行空 DELETE
+        role_tgd_uids = {
+            data["tgd_uid"]
+            for data in data_list
+            if data.get("uid")
+            and data.get("tgd_uid")
+            and data["uid"] != data["tgd_uid"]
+        }
+        for tgd_uid in role_tgd_uids:
+            conditions = (
+                cls.user_id == user_id,
+                cls.bot_id == bot_id,
+                cls.tgd_uid == tgd_uid,
+                or_(cls.uid == "", cls.uid == tgd_uid),
+            )
+            result = await session.execute(
+                select(cls.id).where(*conditions).limit(1)
+            )
+            if result.first() is not None:
+                await session.execute(delete(cls).where(*conditions))
+
+    @classmethod
+    async def _select_then_upsert(
+        cls: Type[T_TGDUser],
+        session: AsyncSession,
+        user_id: str,
+        bot_id: str,
+        uid: str,
+        data: Dict[str, Any],
+    ):
+        """不支持原生 upsert 的数据库: 先查后写"""
         stmt = select(cls).where(
             cls.user_id == user_id,
             cls.bot_id == bot_id,
@@ -85,18 +393,6 @@ class TGDUser(User, table=True):
         else:
             session.add(cls(user_id=user_id, bot_id=bot_id, **data))
 
-        # 成功写入具有角色ID的记录后, 删除同账号同tgd_uid下角色ID为空的记录
-        if uid and tgd_uid and uid != tgd_uid:
-            cleanup = delete(cls).where(
-                cls.user_id == user_id,
-                cls.bot_id == bot_id,
-                cls.tgd_uid == tgd_uid,
-                or_(cls.uid == "", cls.uid == tgd_uid),
-            )
-            await session.execute(cleanup)
-
-        return 0
-
     @classmethod
     @with_session
     async def select_tgd_user(
@@ -115,6 +411,39 @@ class TGDUser(User, table=True):
         data = result.scalars().all()
         return data[0] if data else None
 
+    @classmethod
+    @with_session
+    async def select_tgd_users(
+        cls: Type[T_TGDUser],
+        session: AsyncSession,
+        uids: List[str],
+        user_id: str,
+        bot_id: str,
+    ) -> Dict[str, List[T_TGDUser]]:
+        """一次查询多个角色ID, 每个角色ID只取一条, 按 tgd_uid 分组 (保持 uids 顺序)"""
+        if not uids:
+            return {}
+        sql = (
+            select(cls)
+            .where(
+                cls.user_id == user_id,
+                cls.bot_id == bot_id,
+                cls.uid.in_(uids),
+            )
+            .order_by(cls.id)
+        )
+        result = await session.execute(sql)
+        by_uid: Dict[str, T_TGDUser] = {}
+        for user in result.scalars().all():
+            by_uid.setdefault(user.uid, user)
+
+        groups: Dict[str, List[T_TGDUser]] = {}
+        for uid in dict.fromkeys(uids):
+            user = by_uid.get(uid)
+            if user is not None:
+                groups.setdefault(user.tgd_uid, []).append(user)
+        return groups
+
     @classmethod
     @with_session
     async def select_tgd_user_by_uid(
@@ -145,72 +474,161 @@ class TGDUser(User, table=True):
         result = await session.execute(sql)
         return list(result.scalars().all())
 
+    @classmethod
+    def _sign_user_conditions(cls, switch_on_only: bool) -> List[Any]:
+        """待签到用户的筛选条件"""
+        conditions = [
+            cls.cookie != "",
+            cls.user_id != "",
+            cls.token_valid != "invalid",
+        ]
+        if switch_on_only:
+            conditions.append(cls.sign_switch != "off")
+        return conditions
+
     @classmethod
     @with_session
-    async def get_all_tgd_user(
+    async def count_sign_accounts(
         cls: Type[T_TGDUser],
         session: AsyncSession,
-    ) -> List[T_TGDUser]:
-        """获取所有有 refresh_token 且 token 有效的用户"""
-        sql = (
-            select(cls)
-            .where(cls.cookie != "")
-            .where(cls.user_id != "")
-            .where(cls.token_valid != "invalid")
+        switch_on_only: bool = False,
+    ) -> int:
+        """待签到的账号数 (按 tgd_uid 去重), 与 iter_sign_users 的筛选条件一致"""
+        sql = select(func.count(func.distinct(cls.tgd_uid))).where(
+            *cls._sign_user_conditions(switch_on_only)
         )
         result = await session.execute(sql)
-        return list(result.scalars().all())
+        return result.scalar_one()
 
     @classmethod
     @with_session
-    async def get_sign_switch_on_users(
+    async def _fetch_sign_user_chunk(
         cls: Type[T_TGDUser],
         session: AsyncSession,
-    ) -> List[T_TGDUser]:
-        """获取开启自动签到且 token 有效的用户"""
-        sql = (
-            select(cls)
-            .where(cls.cookie != "")
-            .where(cls.user_id != "")
-            .where(cls.sign_switch != "off")
-            .where(cls.token_valid != "invalid")
+        switch_on_only: bool,
+        after: Optional[Tuple[str, int]],
+        limit: int,
+    ) -> List["TGDSignUser"]:
+        sql = select(*[getattr(cls, c) for c in TGDSignUser.__slots__]).where(
+            *cls._sign_user_conditions(switch_on_only)
         )
+        if after is not None:
+            last_tgd_uid, last_id = after
+            sql = sql.where(
+                or_(
+                    cls.tgd_uid > last_tgd_uid,
+                    and_(cls.tgd_uid == last_tgd_uid, cls.id > last_id),
+                )
+            )
+        sql = sql.order_by(cls.tgd_uid, cls.id).limit(limit)
         result = await session.execute(sql)
-        return list(result.scalars().all())
+        return [TGDSignUser(*row) for row in result.all()]
 
     @classmethod
-    @with_session
-    async def update_cookie_by_tgd_uid(
-        cls: Type[T_TGDUser],
-        session: AsyncSession,
-        tgd_uid: str,
-        cookie: str,
-    ):
-        """更新同一账号下所有记录的 cookie"""
-        sql = (
-            update(cls)
-            .where(cls.tgd_uid == tgd_uid)
-            .values(cookie=cookie)
-        )
-        sql = sql.execution_options(synchronize_session="fetch")
-        await session.execute(sql)
+    async def iter_sign_users(
+        cls,
+        switch_on_only: bool = False,
+        chunk_size: int = 500,
+    ) -> AsyncIterator["TGDSignUser"]:
+        """按 (tgd_uid, id) 顺序流式读取待签到用户, 只取签到需要的列
+
+        键集分页, 每块使用独立的短会话, 迭代期间不长期占用数据库连接和锁
+        """
+        after: Optional[Tuple[str, int]] = None
+        while True:
+            chunk = await cls._fetch_sign_user_chunk(
+                switch_on_only, after, chunk_size
+            )
+            for user in chunk:
+                yield user
+            if len(chunk) < chunk_size:
+                return
+            after = (chunk[-1].tgd_uid, chunk[-1].id)
 
     @classmethod
     @with_session
-    async def set_token_valid_by_cookie(
+    async def batch_update_tokens(
         cls: Type[T_TGDUser],
         session: AsyncSession,
+        cookies: Dict[str, str],
+        token_valid: Dict[str, bool],
+    ):
+        """在同一事务中批量写入 token 有效性和 cookie 轮换
+
+        cookies: {tgd_uid: 新 refresh_token}
+        token_valid: {tgd_uid: 是否有效}
+        """
+        table = cls.__table__
+        if token_valid:
+            sql = (
+                update(table)
+                .where(table.c.tgd_uid == bindparam("b_tgd_uid"))
+                .values(token_valid=bindparam("b_valid"))
+            )
+            await session.execute(
+                sql,
+                [
+                    {"b_tgd_uid": tgd_uid, "b_valid": "" if valid else "invalid"}
+                    for tgd_uid, valid in token_valid.items()
+                ],
+            )
+        if cookies:
+            sql = (
+                update(table)
+                .where(table.c.tgd_uid == bindparam("b_tgd_uid"))
+                .values(cookie=bindparam("b_cookie"))
+            )
+            await session.execute(
+                sql,
+                [
+                    {"b_tgd_uid": tgd_uid, "b_cookie": cookie}
+                    for tgd_uid, cookie in cookies.items()
+                ],
+            )
+
+
+class TGDSignUser:
+    """签到流程使用的 TGDUser 轻量只读投影"""
+
+    __slots__ = (
+        "id",
+        "user_id",
+        "bot_id",
+        "sign_switch",
+        "cookie",
+        "uid",
+        "tgd_uid",
+        "device_id",
+        "role_name",
+        "game_id",
+        "token_valid",
+    )
+
+    def __init__(
+        self,
+        id: int,
+        user_id: str,
+        bot_id: str,
+        sign_switch: str,
         cookie: str,
-        valid: bool,
+        uid: str,
+        tgd_uid: str,
+        device_id: str,
+        role_name: str,
+        game_id: str,
+        token_valid: str,
     ):
-        """通过 cookie(refresh_token) 值查找并设置 token 有效性"""
-        sql = (
-            update(cls)
-            .where(cls.cookie == cookie)
-            .values(token_valid="" if valid else "invalid")
-        )
-        sql = sql.execution_options(synchronize_session="fetch")
-        await session.execute(sql)
+        self.id = id
+        self.user_id = user_id
+        self.bot_id = bot_id
+        self.sign_switch = sign_switch
+        self.cookie = cookie
+        self.uid = uid
+        self.tgd_uid = tgd_uid
+        self.device_id = device_id
+        self.role_name = role_name
+        self.game_id = game_id
+        self.token_valid = token_valid
 
 
 class TGDSignData(PydanticBaseModel):
@@ -237,12 +655,25 @@ class TGDSignData(PydanticBaseModel):
 
 
 class TGDSignRecord(BaseIDModel, table=True):
-    __table_args__: Dict[str, Any] = {"extend_existing": True}
+    __table_args__: Tuple[Any, ...] = (
+        Index("ux_tgdsignrecord_uid_date", "uid", "date", unique=True),
+        {"extend_existing": True},
+    )
     uid: str = Field(title="塔吉多角色ID")
     app_sign: int = Field(default=0, title="APP签到")
     game_sign: int = Field(default=0, title="游戏签到")
     date: str = Field(default_factory=get_today_date, title="签到日期")
 
+    @classmethod
+    @with_session
+    async def ensure_indexes(
+        cls: Type[T_TGDSignRecord],
+        session: AsyncSession,
+    ):
+        """补建缺失的索引, 重复的 (uid, date) 合并签到标记后保留一条"""
+        conn = await session.connection()
+        await conn.run_sync(_ensure_indexes, cls.__table__, _dedupe_sign_records)
+
     @classmethod
     async def _find_sign_record(
         cls: Type[T_TGDSignRecord],
@@ -255,30 +686,73 @@ class TGDSignRecord(BaseIDModel, table=True):
         return result.scalars().first()
 
     @classmethod
-    @with_session
-    async def upsert_sign(
-        cls: Type[T_TGDSignRecord],
-        session: AsyncSession,
-        sign_data: TGDSignData,
-    ) -> Optional[T_TGDSignRecord]:
-        if not sign_data.uid:
-            return None
-
-        sign_data.date = sign_data.date or get_today_date()
-
-        record = await cls._find_sign_record(session, sign_data.uid, sign_data.date)
-
-        if record:
+    def _sign_rows(cls, sign_list: List[TGDSignData]) -> List[Dict[str, Any]]:
+        """按 (uid, date) 合并同一批次中的多条签到数据, 后者覆盖前者的非空字段"""
+        rows: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        for sign_data in sign_list:
+            if not sign_data.uid:
+                continue
+            date = sign_data.date or get_today_date()
+            row = rows.setdefault(
+                (sign_data.uid, date),
+                {"uid": sign_data.uid, "date": date, "app_sign": 0, "game_sign": 0},
+            )
             for field in ["app_sign", "game_sign"]:
                 value = getattr(sign_data, field)
                 if value is not None:
-                    setattr(record, field, value)
-            result = record
+                    row[field] = value
+        return list(rows.values())
+
+    @classmethod
+    async def _upsert_sign_rows(
+        cls,
+        session: AsyncSession,
+        rows: List[Dict[str, Any]],
+    ):
+        if not rows:
+            return
+        table = cls.__table__
+
+        # 签到标记只增不减: 已签到的记录不会被后写入的 0 覆盖
+        def _build_set(new) -> Dict[str, Any]:
+            return {
+                field: case(
+                    (new[field] > table.c[field], new[field]),
+                    else_=table.c[field],
+                )
+                for field in ["app_sign", "game_sign"]
+            }
+
+        # 分块避免超出 SQLite 单语句绑定参数上限
+        for i in range(0, len(rows), UPSERT_CHUNK):
+            chunk = rows[i : i + UPSERT_CHUNK]
+            stmt = await _build_upsert(
+                session, table, chunk, ["uid", "date"], _build_set
+            )
+            if stmt is None:
+                break
+            await session.execute(stmt)
         else:
-            result = cls(**sign_data.model_dump())
-            session.add(result)
+            return
+
+        # 不支持原生 upsert 的数据库: 先查后写
+        for row in rows:
+            record = await cls._find_sign_record(session, row["uid"], row["date"])
+            if record is None:
+                session.add(cls(**row))
+                continue
+            for field in ["app_sign", "game_sign"]:
+                setattr(record, field, max(getattr(record, field), row[field]))
 
-        return result
+    @classmethod
+    @with_session
+    async def batch_upsert_sign(
+        cls: Type[T_TGDSignRecord],
+        session: AsyncSession,
+        sign_list: List[TGDSignData],
+    ):
+        """单条多行 upsert 批量写入签到记录"""
+        await cls._upsert_sign_rows(session, cls._sign_rows(sign_list))
 
     @classmethod
     @with_session
@@ -320,6 +794,172 @@ class TGDSignRecord(BaseIDModel, table=True):
         return record.app_sign >= 1 and record.game_sign >= 1
 
 
+class TGDSignRun(BaseIDModel, table=True):
+    """一次自动签到任务, 进程重启后可据此续签当日未完成的账号"""
+
+    __table_args__: Tuple[Any, ...] = (
+        Index("ix_tgdsignrun_date", "date"),
+        {"extend_existing": True},
+    )
+    date: str = Field(default_factory=get_today_date, title="签到日期")
+    state: str = Field(default="running", title="状态")
+    started_at: int = Field(default=0, title="开始时间")
+    finished_at: int = Field(default=0, title="结束时间")
+    avg_cost: float = Field(default=0, title="单账号平均耗时(秒)")
+
+    @classmethod
+    @with_session
+    async def get_unfinished_run(
+        cls: Type[T_TGDSignRun],
+        session: AsyncSession,
+        date: Optional[str] = None,
+    ) -> Optional[T_TGDSignRun]:
+        sql = (
+            select(cls)
+            .where(cls.date == (date or get_today_date()))
+            .where(cls.state == "running")
+            .order_by(cls.id.desc())
+            .limit(1)
+        )
+        result = await session.execute(sql)
+        return result.scalars().first()
+
+    @classmethod
+    @with_session
+    async def get_last_avg_cost(
+        cls: Type[T_TGDSignRun],
+        session: AsyncSession,
+    ) -> float:
+        """最近一次记录的单账号平均耗时, 没有时返回 0"""
+        sql = (
+            select(cls.avg_cost)
+            .where(cls.avg_cost > 0)
+            .order_by(cls.id.desc())
+            .limit(1)
+        )
+        result = await session.execute(sql)
+        return result.scalars().first() or 0
+
+    @classmethod
+    @with_session
+    async def start_run(
+        cls: Type[T_TGDSignRun],
+        session: AsyncSession,
+    ) -> T_TGDSignRun:
+        run = cls(started_at=int(time.time()))
+        session.add(run)
+        await session.flush()
+        return run
+
+    @classmethod
+    @with_session
+    async def finish_run(
+        cls: Type[T_TGDSignRun],
+        session: AsyncSession,
+        run_id: int,
+        avg_cost: float = 0,
+    ):
+        values: Dict[str, Any] = {"state": "done", "finished_at": int(time.time())}
+        if avg_cost > 0:
+            values["avg_cost"] = avg_cost
+        sql = update(cls).where(cls.id == run_id).values(**values)
+        await session.execute(sql)
+
+    @classmethod
+    @with_session
+    async def clear_run(
+        cls: Type[T_TGDSignRun],
+        session: AsyncSession,
+        date: str,
+    ):
+        """删除 date 及之前的任务和对应的签到日志"""
+        run_ids = select(cls.id).where(cls.date <= date)
+        await session.execute(
+            delete(TGDSignJournal).where(TGDSignJournal.run_id.in_(run_ids))
+        )
+        await session.execute(delete(cls).where(cls.date <= date))
+
+
+class TGDSignJournal(BaseIDModel, table=True):
+    """自动签到任务中每个账号的签到结果, 用于续签和汇总推送"""
+
+    __table_args__: Tuple[Any, ...] = (
+        Index("ux_tgdsignjournal_run_tgd_uid", "run_id", "tgd_uid", unique=True),
+        {"extend_existing": True},
+    )
+    run_id: int = Field(title="任务ID")
+    tgd_uid: str = Field(title="塔吉多UID")
+    state: str = Field(default="success", title="状态")
+    result: str = Field(default="", title="签到结果")
+    user_id: str = Field(default="", title="用户ID")
+    bot_id: str = Field(default="", title="BotID")
+    sign_switch: str = Field(default="off", title="推送方式")
+
+    @classmethod
+    @with_session
+    async def get_finished_tgd_uids(
+        cls: Type[T_TGDSignJournal],
+        session: AsyncSession,
+        run_id: int,
+    ) -> Set[str]:
+        sql = select(cls.tgd_uid).where(cls.run_id == run_id)
+        result = await session.execute(sql)
+        return set(result.scalars().all())
+
+    @classmethod
+    @with_session
+    async def get_run_entries(
+        cls: Type[T_TGDSignJournal],
+        session: AsyncSession,
+        run_id: int,
+    ) -> List[T_TGDSignJournal]:
+        sql = select(cls).where(cls.run_id == run_id).order_by(cls.id)
+        result = await session.execute(sql)
+        return list(result.scalars().all())
+
+    @classmethod
+    @with_session
+    async def batch_record(
+        cls: Type[T_TGDSignJournal],
+        session: AsyncSession,
+        entries: List[Dict[str, Any]],
+    ):
+        """批量写入账号签到结果, 同一任务内重复写入时以最新结果为准"""
+        if not entries:
+            return
+        table = cls.__table__
+        for i in range(0, len(entries), UPSERT_CHUNK):
+            chunk = entries[i : i + UPSERT_CHUNK]
+            stmt = await _build_upsert(
+                session,
+                table,
+                chunk,
+                ["run_id", "tgd_uid"],
+                lambda new: {k: new[k] for k in ["state", "result"]},
+            )
+            if stmt is not None:
+                await session.execute(stmt)
+                continue
+            for entry in chunk:
+                await session.execute(
+                    delete(cls).where(
+                        cls.run_id == entry["run_id"],
+                        cls.tgd_uid == entry["tgd_uid"],
+                    )
+                )
+                session.add(cls(**entry))
+
+
+@on_core_start
+async def migrate_tgd_indexes():
+    """为已有数据库补建索引; 失败时对应表的写入回退为先查后写"""
+    for model in (TGDUser, TGDSignRecord):
+        try:
+            await model.ensure_indexes()
+        except Exception as e:
+            logger.warning(f"[TGDSign] {model.__name__} 建立索引失败: {e}")
+
+
 @site.register_admin
 class TGDBindAdmin(GsAdminModel):
     pk_name = "id"
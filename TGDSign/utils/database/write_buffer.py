@@ -0,0 +1,214 @@
+"""签到结果写缓冲
+
+签到过程中的签到记录、cookie 轮换、token 有效性变更和任务日志先在内存中合并,
+每攒够 FLUSH_MAX_ITEMS 条或每隔 FLUSH_INTERVAL 秒批量写入一次,
+结束时再同步写入剩余数据, 避免并发签到时每次写库都单独开事务。
+
+cookie 轮换后旧 refresh token 即在服务端失效, 因此新 cookie 一到就立即唤醒写入,
+结束时写入失败也不会丢弃, 而是转入后台持续重试直到落库。
+"""
+
+import asyncio
+from typing import Any, Set, Dict, Tuple, Optional
+
+from gsuid_core.logger import logger
+
+from ..token_store import token_store
+from .models import TGDSignData, TGDSignJournal, TGDSignRecord, TGDUser
+
+FLUSH_MAX_ITEMS = 50
+FLUSH_INTERVAL = 0.5
+# 结束时 cookie 写入失败的重试间隔, 仍失败则转入后台每 COOKIE_RETRY_INTERVAL 秒重试
+CLOSE_RETRY_DELAYS = (0.5, 2, 5)
+COOKIE_RETRY_INTERVAL = 30
+
+_cookie_retry_tasks: Set[asyncio.Task] = set()
+
+
+def _latest_cookies(cookies: Dict[str, str]) -> Dict[str, str]:
+    """以内存中最新轮换的 refresh token 为准, 避免较早排队的值覆盖新登录写入的 cookie"""
+    return {
+        tgd_uid: token_store.get_refresh_token(tgd_uid) or cookie
+        for tgd_uid, cookie in cookies.items()
+    }
+
+
+async def _write_cookies_until_done(cookies: Dict[str, str]):
+    while True:
+        await asyncio.sleep(COOKIE_RETRY_INTERVAL)
+        try:
+            await TGDUser.batch_update_tokens(_latest_cookies(cookies), {})
+        except Exception as e:
+            logger.error(
+                f"[TGDSign] {len(cookies)} 个账号的 cookie 仍未写入, "
+                f"{COOKIE_RETRY_INTERVAL} 秒后重试: {e}"
+            )
+            continue
+        logger.info(f"[TGDSign] 已补写 {len(cookies)} 个账号的 cookie")
+        return
+
+
+def _retry_cookies_later(cookies: Dict[str, str]):
+    task = asyncio.create_task(_write_cookies_until_done(dict(cookies)))
+    _cookie_retry_tasks.add(task)
+    task.add_done_callback(_cookie_retry_tasks.discard)
+
+
+class SignWriteBuffer:
+    def __init__(
+        self,
+        max_items: int = FLUSH_MAX_ITEMS,
+        interval: float = FLUSH_INTERVAL,
+    ):
+        self.max_items = max_items
+        self.interval = interval
+        # {uid: 合并后的签到数据}
+        self._signs: Dict[str, TGDSignData] = {}
+        # {tgd_uid: 最新 refresh_token}
+        self._cookies: Dict[str, str] = {}
+        # {tgd_uid: 是否有效}
+        self._token_valid: Dict[str, bool] = {}
+        # {(run_id, tgd_uid): 账号签到结果}
+        self._journal: Dict[Tuple[int, str], Dict[str, Any]] = {}
+        self._flush_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+
+    @property
+    def pending(self) -> int:
+        return (
+            len(self._signs)
+            + len(self._cookies)
+            + len(self._token_valid)
+            + len(self._journal)
+        )
+
+    async def __aenter__(self) -> "SignWriteBuffer":
+        self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    def add_sign(self, sign_data: TGDSignData):
+        pending = self._signs.get(sign_data.uid)
+        if pending is None:
+            self._signs[sign_data.uid] = sign_data.model_copy()
+        else:
+            for field in ["app_sign", "game_sign"]:
+                value = getattr(sign_data, field)
+                if value is not None:
+                    setattr(pending, field, value)
+        self._notify()
+
+    def set_cookie(self, tgd_uid: str, cookie: str):
+        self._cookies[tgd_uid] = cookie
+        # 旧 token 已失效, 不等批量阈值, 立即唤醒写入
+        self._wakeup.set()
+
+    def set_token_valid(self, tgd_uid: str, valid: bool):
+        self._token_valid[tgd_uid] = valid
+        self._notify()
+
+    def add_journal(
+        self,
+        run_id: int,
+        tgd_uid: str,
+        state: str,
+        result: str,
+        user_id: str,
+        bot_id: str,
+        sign_switch: str,
+    ):
+        """记录自动签到任务中账号的签到结果, 在签到记录之后写入"""
+        self._journal[(run_id, tgd_uid)] = {
+            "run_id": run_id,
+            "tgd_uid": tgd_uid,
+            "state": state,
+            "result": result,
+            "user_id": user_id,
+            "bot_id": bot_id,
+            "sign_switch": sign_switch,
+        }
+        self._notify()
+
+    def _notify(self):
+        if self.pending >= self.max_items:
+            self._wakeup.set()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self):
+        async with self._flush_lock:
+            if not self.pending:
+                return
+            signs, self._signs = self._signs, {}
+            cookies, self._cookies = self._cookies, {}
+            token_valid, self._token_valid = self._token_valid, {}
+            journal, self._journal = self._journal, {}
+
+            cookies = _latest_cookies(cookies)
+
+            try:
+                if cookies or token_valid:
+                    await TGDUser.batch_update_tokens(cookies, token_valid)
+            except Exception as e:
+                logger.error(f"[TGDSign] 批量写入 token 失败, 稍后重试: {e}")
+                # 写入失败时放回, 期间产生的新值优先
+                self._cookies = {**cookies, **self._cookies}
+                self._token_valid = {**token_valid, **self._token_valid}
+
+            try:
+                if signs:
+                    await TGDSignRecord.batch_upsert_sign(list(signs.values()))
+            except Exception as e:
+                logger.error(f"[TGDSign] 批量写入签到记录失败, 稍后重试: {e}")
+                for sign_data in signs.values():
+                    if sign_data.uid not in self._signs:
+                        self._signs[sign_data.uid] = sign_data
+                # 签到记录未落库时不写日志, 避免续签时跳过这些账号
+                self._journal = {**journal, **self._journal}
+                return
+
+            try:
+                if journal:
+                    await TGDSignJournal.batch_record(list(journal.values()))
+            except Exception as e:
+                logger.error(f"[TGDSign] 批量写入签到日志失败, 稍后重试: {e}")
+                self._journal = {**journal, **self._journal}
+
+    async def close(self):
+        """停止后台写入并同步写入剩余数据"""
+        if self._task is not None:
+            # 不直接 cancel, 避免打断进行中的写入
+            self._closing = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        await self.flush()
+
+        # cookie 丢失意味着账号失效, 写入失败时重试而不是丢弃
+        for delay in CLOSE_RETRY_DELAYS:
+            if not self._cookies:
+                return
+            await asyncio.sleep(delay)
+            await self.flush()
+        if self._cookies:
+            logger.error(
+                f"[TGDSign] {len(self._cookies)} 个账号的 cookie 写入失败, "
+                f"转入后台重试"
+            )
+            _retry_cookies_later(self._cookies)
+            self._cookies = {}
@@ -0,0 +1,72 @@
+"""按 key 划分的异步锁与请求合并"""
+
+import asyncio
+import weakref
+from typing import Any, Dict, Callable, Hashable, Awaitable
+
+
+class KeyedLock:
+    """为每个 key 分配一把 asyncio.Lock
+
+    注册表只持有弱引用, 没有协程持有或等待的锁会被自动回收, 不会随账号数增长
+    """
+
+    def __init__(self):
+        self._locks: "weakref.WeakValueDictionary[Hashable, asyncio.Lock]" = (
+            weakref.WeakValueDictionary()
+        )
+
+    def get(self, key: Hashable) -> asyncio.Lock:
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._locks[key] = lock
+        return lock
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+
+class _LeaderCancelled(Exception):
+    """执行者被取消, 等待者应自行重新执行"""
+
+
+class SingleFlight:
+    """同一 key 同时只执行一次, 并发调用者等待并共享进行中的结果
+
+    执行者被取消时等待者不会随之收到 CancelledError, 而是由其中一个重新执行
+    """
+
+    def __init__(self):
+        self._flights: Dict[Hashable, "asyncio.Future[Any]"] = {}
+
+    def in_flight(self, key: Hashable) -> bool:
+        return key in self._flights
+
+    async def run(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        future = self._flights.get(key)
+        while future is not None:
+            try:
+                # shield: 等待者被取消时不影响正在执行的调用
+                return await asyncio.shield(future)
+            except _LeaderCancelled:
+                future = self._flights.get(key)
+
+        future = asyncio.get_running_loop().create_future()
+        self._flights[key] = future
+        try:
+            result = await func()
+        except asyncio.CancelledError:
+            future.set_exception(_LeaderCancelled())
+            future.exception()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # 没有等待者时避免 "exception was never retrieved" 警告
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            self._flights.pop(key, None)
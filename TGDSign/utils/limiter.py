@@ -0,0 +1,73 @@
+"""自适应并发控制 (AIMD)
+
+请求延迟正常且无错误时每轮加性增长并发上限,
+遇到超时、429/5xx 或"频繁"提示时乘性回退。
+"""
+
+import time
+import asyncio
+from typing import Optional
+
+# 回退系数及两次回退的最小间隔, 避免同一波错误把并发连续砍半
+DECREASE_FACTOR = 0.5
+DECREASE_COOLDOWN = 5.0
+# 延迟超过 基线 * LATENCY_TOLERANCE 时停止增长
+LATENCY_TOLERANCE = 2.0
+LATENCY_FLOOR = 1.0
+
+
+class AdaptiveLimiter:
+    def __init__(self, initial: int = 1, min_limit: int = 1, max_limit: int = 10):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.limit = float(initial)
+        self.in_flight = 0
+        self._cond = asyncio.Condition()
+        self._baseline: Optional[float] = None
+        self._last_decrease = 0.0
+
+    def configure(self, initial: int, max_limit: int):
+        self.max_limit = max(self.min_limit, max_limit)
+        self.limit = float(min(max(initial, self.min_limit), self.max_limit))
+        self._baseline = None
+
+    @property
+    def current(self) -> int:
+        return max(self.min_limit, int(self.limit))
+
+    async def acquire(self):
+        async with self._cond:
+            while self.in_flight >= self.current:
+                await self._cond.wait()
+            self.in_flight += 1
+
+    async def release(self):
+        async with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.release()
+
+    def on_success(self, latency: float):
+        # 基线取观测到的最小延迟, 并缓慢上浮以适应服务端整体变慢
+        if self._baseline is None or latency < self._baseline:
+            self._baseline = latency
+        else:
+            self._baseline += (latency - self._baseline) * 0.01
+
+        threshold = max(LATENCY_FLOOR, self._baseline * LATENCY_TOLERANCE)
+        if latency <= threshold and self.limit < self.max_limit:
+            # 每个并发周期约增长 1
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+    def on_overload(self):
+        now = time.monotonic()
+        if now - self._last_decrease < DECREASE_COOLDOWN:
+            return
+        self._last_decrease = now
+        self.limit = max(self.min_limit, self.limit * DECREASE_FACTOR)
@@ -0,0 +1,213 @@
+"""接口与渲染耗时统计, 以 Prometheus 文本格式挂载在 /tgd/metrics
+
+统计接口与登录页共用同一个对外服务, 默认关闭 (MetricsEnable),
+设置 MetricsToken 后需携带 Authorization: Bearer <Token> 访问。
+"""
+
+import hmac
+import time
+from collections import defaultdict
+from typing import Callable, DefaultDict, Dict, List, Tuple
+
+from starlette.requests import Request
+from starlette.responses import Response, PlainTextResponse
+
+from gsuid_core.logger import logger
+from gsuid_core.app_life import app as fastapi_app
+
+from ..tgdsign_config.tgdsign_config import TGDSignConfig
+from .api import api
+from .api.requests import RequestOutcome, tgd_api
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+RENDER_BUCKETS = (0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 15.0, 30.0)
+
+# 接口地址 -> api.py 中的常量名, 作为 endpoint 标签
+ENDPOINT_NAMES: Dict[str, str] = {
+    value: name
+    for name, value in vars(api).items()
+    if isinstance(value, str) and value.startswith("https://")
+}
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.sum += value
+        self.count += 1
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+    def lines(self, name: str, labels: str) -> List[str]:
+        result = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            result.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        result.append(f'{name}_bucket{{{labels},le="+Inf"}} {self.count}')
+        result.append(f"{name}_sum{{{labels}}} {self.sum:.6f}")
+        result.append(f"{name}_count{{{labels}}} {self.count}")
+        return result
+
+
+def _outcome_label(outcome: RequestOutcome) -> str:
+    if outcome.error is not None:
+        return "error"
+    if outcome.throttled:
+        return "throttled"
+    status = outcome.status_code or 0
+    if status >= 500:
+        return "http_5xx"
+    if status >= 400:
+        return "http_4xx"
+    return "ok"
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.started_at = time.time()
+        # {(endpoint, outcome): 次数}
+        self.requests: DefaultDict[Tuple[str, str], int] = defaultdict(int)
+        # {(endpoint, 异常类名): 次数}
+        self.errors: DefaultDict[Tuple[str, str], int] = defaultdict(int)
+        self.latency: Dict[str, Histogram] = {}
+        # {(模板名, 结果): 次数}
+        self.renders: DefaultDict[Tuple[str, str], int] = defaultdict(int)
+        self.render_latency: Dict[str, Histogram] = {}
+        self._gauges: Dict[str, Tuple[str, Callable[[], float]]] = {}
+
+    def add_gauge(self, name: str, help_text: str, getter: Callable[[], float]):
+        self._gauges[name] = (help_text, getter)
+
+    def observe_request(self, outcome: RequestOutcome):
+        endpoint = ENDPOINT_NAMES.get(outcome.url, "OTHER")
+        self.requests[(endpoint, _outcome_label(outcome))] += 1
+        if outcome.error is not None:
+            self.errors[(endpoint, type(outcome.error).__name__)] += 1
+            return
+        hist = self.latency.get(endpoint)
+        if hist is None:
+            hist = self.latency[endpoint] = Histogram(LATENCY_BUCKETS)
+        hist.observe(outcome.elapsed)
+
+    def observe_render(self, template: str, elapsed: float, success: bool):
+        self.renders[(template, "ok" if success else "failed")] += 1
+        hist = self.render_latency.get(template)
+        if hist is None:
+            hist = self.render_latency[template] = Histogram(RENDER_BUCKETS)
+        hist.observe(elapsed)
+
+    def export(self) -> str:
+        lines = [
+            "# HELP tgd_api_requests_total 塔吉多接口请求次数",
+            "# TYPE tgd_api_requests_total counter",
+        ]
+        for (endpoint, outcome), count in sorted(self.requests.items()):
+            lines.append(
+                f'tgd_api_requests_total{{endpoint="{endpoint}",outcome="{outcome}"}} {count}'
+            )
+
+        lines += [
+            "# HELP tgd_api_errors_total 塔吉多接口异常次数 (按异常类型)",
+            "# TYPE tgd_api_errors_total counter",
+        ]
+        for (endpoint, error), count in sorted(self.errors.items()):
+            lines.append(
+                f'tgd_api_errors_total{{endpoint="{endpoint}",error="{error}"}} {count}'
+            )
+
+        lines += [
+            "# HELP tgd_api_latency_seconds 塔吉多接口耗时",
+            "# TYPE tgd_api_latency_seconds histogram",
+        ]
+        for endpoint, hist in sorted(self.latency.items()):
+            lines += hist.lines("tgd_api_latency_seconds", f'endpoint="{endpoint}"')
+
+        lines += [
+            "# HELP tgd_render_total HTML 渲染次数",
+            "# TYPE tgd_render_total counter",
+        ]
+        for (template, result), count in sorted(self.renders.items()):
+            lines.append(
+                f'tgd_render_total{{template="{template}",result="{result}"}} {count}'
+            )
+
+        lines += [
+            "# HELP tgd_render_seconds HTML 渲染耗时",
+            "# TYPE tgd_render_seconds histogram",
+        ]
+        for template, hist in sorted(self.render_latency.items()):
+            lines += hist.lines("tgd_render_seconds", f'template="{template}"')
+
+        for name, (help_text, getter) in sorted(self._gauges.items()):
+            try:
+                value = float(getter())
+            except Exception:
+                continue
+            lines += [
+                f"# HELP {name} {help_text}",
+                f"# TYPE {name} gauge",
+                f"{name} {value}",
+            ]
+
+        lines += [
+            "# HELP tgd_uptime_seconds 统计开始后经过的秒数",
+            "# TYPE tgd_uptime_seconds gauge",
+            f"tgd_uptime_seconds {time.time() - self.started_at:.0f}",
+        ]
+        return "\n".join(lines) + "\n"
+
+
+tgd_metrics = MetricsRegistry()
+tgd_api.add_observer(tgd_metrics.observe_request)
+
+
+def _authorized(request: Request) -> bool:
+    token = TGDSignConfig.get_config("MetricsToken").data
+    if not token:
+        return True
+    auth = request.headers.get("authorization", "")
+    scheme, _, value = auth.partition(" ")
+    return scheme.lower() == "bearer" and hmac.compare_digest(
+        value.strip().encode(), token.encode()
+    )
+
+
+async def _metrics_endpoint(request: Request):
+    # 未开启时与不存在的路由一样返回 404
+    if not TGDSignConfig.get_config("MetricsEnable").data:
+        return Response(status_code=404)
+    if not _authorized(request):
+        return Response(status_code=401, headers={"WWW-Authenticate": "Bearer"})
+    return PlainTextResponse(
+        tgd_metrics.export(),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
+
+
+def _mount_metrics() -> None:
+    try:
+        for route in fastapi_app.routes:
+            if getattr(route, "path", None) == "/tgd/metrics":
+                return
+        fastapi_app.add_api_route(
+            "/tgd/metrics",
+            _metrics_endpoint,
+            methods=["GET"],
+            include_in_schema=False,
+        )
+        logger.debug("[TGD] 已挂载统计路由 /tgd/metrics")
+    except Exception as e:
+        logger.warning(f"[TGD] 挂载统计路由失败: {e}")
+
+
+_mount_metrics()
@@ -0,0 +1,50 @@
+"""令牌桶限流"""
+
+import time
+import asyncio
+from typing import Optional
+
+
+class TokenBucket:
+    """按 rate 个/秒补充令牌, 最多积攒 capacity 个; rate <= 0 表示不限流"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def set_rate(self, rate: float, capacity: Optional[float] = None):
+        if rate == self.rate and capacity in (None, self.capacity):
+            return
+        self._refill()
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1)
+        self._tokens = min(self._tokens, self.capacity)
+
+    def _refill(self):
+        now = time.monotonic()
+        if self.rate > 0:
+            self._tokens = min(
+                self.capacity, self._tokens + (now - self._updated) * self.rate
+            )
+        self._updated = now
+
+    def try_acquire(self, tokens: float = 1) -> bool:
+        """立即尝试取令牌, 不足时返回 False"""
+        if self.rate <= 0:
+            return True
+        self._refill()
+        if self._tokens >= tokens:
+            self._tokens -= tokens
+            return True
+        return False
+
+    async def acquire(self, tokens: float = 1):
+        """等待直到取到令牌, 等待者按先来后到排队"""
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            while not self.try_acquire(tokens):
+                await asyncio.sleep((tokens - self._tokens) / self.rate)
@@ -12,6 +12,8 @@ from gsuid_core.config import core_config, CONFIG_DEFAULT
 from gsuid_core.app_life import app as fastapi_app
 from fastapi.staticfiles import StaticFiles
 from .path import TEMP_PATH, BAKE_PATH, ANN_CACHE_PATH
+from .cache import TTLCache
+from .metrics import tgd_metrics
 from ..tgdsign_config.tgdsign_config import TGDSignConfig
 
 logging.getLogger("uvicorn.access").addFilter(
@@ -225,6 +227,15 @@ async def _render_via_remote(html_content: str, remote_url: str) -> Optional[byt
 
 
 async def render_html(tgd_templates, template_name: str, context: dict) -> Optional[bytes]:
+    start_time = time.monotonic()
+    result = await _render_html(tgd_templates, template_name, context)
+    tgd_metrics.observe_render(
+        template_name, time.monotonic() - start_time, result is not None
+    )
+    return result
+
+
+async def _render_html(tgd_templates, template_name: str, context: dict) -> Optional[bytes]:
 
     try:
         logger.debug(f"[TGD] HTML渲染开始: {template_name}")
@@ -348,12 +359,28 @@ def image_to_base64(image_path: Union[str, Path], quality: int = 0) -> str:
         return ""
 
 
+# 已编码图片的内存缓存, 避免每次渲染都重复读盘和 base64 编码
+_image_b64_cache: TTLCache[str] = TTLCache(timeout=600, maxsize=128)
+
+
 async def get_image_b64_with_cache(
     url: str, cache_path: Path, quality=None, cover_size: tuple = None,
 ) -> str:
     if not url:
         return ""
 
+    key = (url, str(cache_path), quality, cover_size)
+    result = await _image_b64_cache.get_or_set(
+        key,
+        lambda: _load_image_b64(url, cache_path, quality, cover_size),
+    )
+    return result or ""
+
+
+async def _load_image_b64(
+    url: str, cache_path: Path, quality=None, cover_size: tuple = None,
+) -> Optional[str]:
+    """读取(必要时烘焙)图片并编码为 data URI, 失败时返回 None 以免被缓存"""
     try:
         from .image import pic_download_from_url
         from PIL import Image
@@ -413,4 +440,4 @@ async def get_image_b64_with_cache(
 
     except Exception as e:
         logger.warning(f"[渲染工具] 获取图片 base64 失败: {url}, {e}")
-        return ""
+        return None
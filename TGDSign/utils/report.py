@@ -0,0 +1,127 @@
+"""签到结果推送
+
+与原先逐个 Bot 推送相同, 每条消息经所有在线连接发送: gss.active_bot 以连接ID
+为 key, 无法从记录中的适配器 bot_id 判断目标在哪个连接上, 且连接不服务该适配器
+时 target_send 不会报错。固定数量的发送协程从队列取消息并发发送, 每个连接单独
+限速, 签到过程中即可边签边推送。
+
+私聊按账号推送, 一个用户绑定多个账号时会收到多条消息。
+"""
+
+import asyncio
+from typing import Any, Dict, List, Tuple, Optional
+
+from gsuid_core.gss import gss
+from gsuid_core.logger import logger
+
+from .rate_limit import TokenBucket
+
+# (bot_id, 消息类型, 目标ID, 消息内容)
+ReportItem = Tuple[str, str, str, str]
+
+
+class ReportDispatcher:
+    def __init__(self, concurrency: int = 3, rate: float = 1):
+        """
+        concurrency: 同时发送的消息数
+        rate: 每个 Bot 每秒最多发送的消息数, 0 为不限
+        """
+        self.concurrency = max(concurrency, 1)
+        self.rate = rate
+        self._queue: "asyncio.Queue[Optional[ReportItem]]" = asyncio.Queue()
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._workers: List[asyncio.Task] = []
+        self.sent = 0
+        self.failed = 0
+
+    async def __aenter__(self) -> "ReportDispatcher":
+        self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    def submit(
+        self,
+        bot_id: str,
+        target_type: str,
+        target_id: str,
+        message: str,
+    ):
+        self._queue.put_nowait((bot_id, target_type, target_id, message))
+
+    def start(self):
+        if not self._workers:
+            self._workers = [
+                asyncio.create_task(self._worker())
+                for _ in range(self.concurrency)
+            ]
+
+    async def _worker(self):
+        while True:
+            item = await self._queue.get()
+            if item is None:
+                return
+            await self._send(*item)
+
+    async def _send(
+        self,
+        bot_id: str,
+        target_type: str,
+        target_id: str,
+        message: str,
+    ):
+        bots = list(gss.active_bot.items())
+        if not bots:
+            self.failed += 1
+            logger.warning(
+                f"[TGDSign] 无在线 Bot, 推送取消 {target_type} {target_id}"
+            )
+            return
+
+        name = "私聊" if target_type == "direct" else "群聊"
+        results = await asyncio.gather(
+            *(
+                self._send_via(key, bot, bot_id, target_type, target_id, message)
+                for key, bot in bots
+            ),
+            return_exceptions=True,
+        )
+        failures = 0
+        for (key, _), result in zip(bots, results):
+            if isinstance(result, Exception):
+                failures += 1
+                logger.warning(
+                    f"[TGDSign] {name}推送经 {key} 失败 {target_id}: {result}"
+                )
+
+        # 任一连接发送成功即视为已推送
+        if failures < len(bots):
+            self.sent += 1
+        else:
+            self.failed += 1
+            logger.error(
+                f"[TGDSign] {name}推送失败 {target_id}: 所有 Bot 均发送失败"
+            )
+
+    async def _send_via(
+        self,
+        key: str,
+        bot: Any,
+        bot_id: str,
+        target_type: str,
+        target_id: str,
+        message: str,
+    ):
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(self.rate, capacity=1)
+        await bucket.acquire()
+        await bot.target_send(message, target_type, target_id, bot_id, "", "")
+
+    async def close(self):
+        """发送完队列中剩余的消息后停止"""
+        for _ in self._workers:
+            self._queue.put_nowait(None)
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
@@ -0,0 +1,103 @@
+"""塔吉多 AccessToken 缓存
+
+按 tgd_uid 记录最近一次刷新得到的 access token 及签发时间,
+有效期内的签到直接复用, 避免每次都调用 refreshToken 轮换 cookie。
+"""
+
+import json
+import time
+import base64
+from typing import Dict, Optional
+
+from .keyed_lock import KeyedLock
+
+# 距离过期不足该秒数时视为需要刷新
+REFRESH_MARGIN = 300
+
+
+def _get_default_ttl() -> int:
+    from ..tgdsign_config.tgdsign_config import TGDSignConfig
+
+    return TGDSignConfig.get_config("AccessTokenTTL").data * 60
+
+
+def _parse_jwt_exp(token: str) -> Optional[float]:
+    """access token 为 JWT 时读取其 exp 声明, 否则返回 None"""
+    parts = token.split(".")
+    if len(parts) != 3:
+        return None
+    try:
+        payload = parts[1] + "=" * (-len(parts[1]) % 4)
+        data = json.loads(base64.urlsafe_b64decode(payload))
+        exp = data.get("exp")
+        return float(exp) if exp else None
+    except Exception:
+        return None
+
+
+class AccessTokenEntry:
+    __slots__ = ("access_token", "refresh_token", "issued_at", "expires_at")
+
+    def __init__(
+        self,
+        access_token: str,
+        refresh_token: str,
+        issued_at: float,
+        expires_at: float,
+    ):
+        self.access_token = access_token
+        self.refresh_token = refresh_token
+        self.issued_at = issued_at
+        self.expires_at = expires_at
+
+    def is_fresh(self, now: Optional[float] = None) -> bool:
+        now = now or time.time()
+        return bool(self.access_token) and now < self.expires_at - REFRESH_MARGIN
+
+
+class AccessTokenStore:
+    def __init__(self):
+        self._entries: Dict[str, AccessTokenEntry] = {}
+
+    def put(self, tgd_uid: str, access_token: str, refresh_token: str):
+        now = time.time()
+        ttl = _get_default_ttl()
+        expires_at = now + ttl
+        jwt_exp = _parse_jwt_exp(access_token)
+        if jwt_exp and ttl > 0:
+            expires_at = min(expires_at, jwt_exp)
+        self._entries[tgd_uid] = AccessTokenEntry(
+            access_token, refresh_token, now, expires_at
+        )
+
+    def get(self, tgd_uid: str) -> Optional[AccessTokenEntry]:
+        """返回仍在有效期内的 access token 记录"""
+        entry = self._entries.get(tgd_uid)
+        if entry and entry.is_fresh():
+            return entry
+        return None
+
+    def last_refreshed(self, tgd_uid: str) -> Optional[float]:
+        """本进程内最近一次取得该账号 token 的时间戳, 没有记录时返回 None"""
+        entry = self._entries.get(tgd_uid)
+        return entry.issued_at if entry else None
+
+    def get_refresh_token(self, tgd_uid: str) -> Optional[str]:
+        """最近一次轮换得到的 refresh token, 比数据库中读出的更新"""
+        entry = self._entries.get(tgd_uid)
+        return entry.refresh_token if entry else None
+
+    def invalidate(self, tgd_uid: str):
+        """服务端拒绝 access token 时调用, 保留 refresh token 供下次刷新"""
+        entry = self._entries.get(tgd_uid)
+        if entry:
+            entry.access_token = ""
+            entry.expires_at = 0
+
+    def discard(self, tgd_uid: str):
+        self._entries.pop(tgd_uid, None)
+
+
+token_store = AccessTokenStore()
+# 刷新 / 写入同一账号的 token 时持有, refresh token 轮换期间不会被并发使用旧值
+refresh_locks = KeyedLock()
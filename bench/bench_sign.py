@@ -0,0 +1,193 @@
+"""自动签到压测
+
+在临时 SQLite 数据库中写入 N 个模拟账号, 使用 FakeTajiduo 替换网络层后
+执行一次 tgd_auto_sign_task, 输出吞吐、单账号耗时分位数、数据库耗时和内存峰值。
+不会读写 gsuid_core 的正式数据库, 配置修改只在本进程内存中生效。
+
+在装有 gsuid_core 的环境中, 于仓库根目录运行:
+
+    python -m bench.bench_sign --accounts 2000 --roles 2 --latency 0.05 0.2
+"""
+
+import time
+import asyncio
+import argparse
+import tempfile
+import statistics
+import tracemalloc
+from pathlib import Path
+from typing import List
+
+from sqlalchemy import event
+from sqlmodel import SQLModel
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from gsuid_core.utils.database import base_models
+
+from TGDSign.tgdsign_sign import sign_handler
+from TGDSign.utils.api.api import GAMEID_HT, GAMEID_NTE
+from TGDSign.utils.api.requests import tgd_api
+from TGDSign.utils.database.models import TGDUser
+from TGDSign.tgdsign_config.tgdsign_config import TGDSignConfig
+
+from .fake_tajiduo import FakeTajiduo
+
+BENCH_BOT_ID = "tgd_bench"
+
+
+class DBTimer:
+    """统计 SQL 执行次数与总耗时"""
+
+    def __init__(self, engine):
+        self.count = 0
+        self.total = 0.0
+        sync_engine = engine.sync_engine
+        event.listen(sync_engine, "before_cursor_execute", self._before)
+        event.listen(sync_engine, "after_cursor_execute", self._after)
+
+    def _before(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("tgd_bench_start", []).append(time.perf_counter())
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany):
+        start = conn.info["tgd_bench_start"].pop()
+        self.count += 1
+        self.total += time.perf_counter() - start
+
+
+def _override_config(key: str, value):
+    """只修改内存中的配置, 不写回配置文件"""
+    TGDSignConfig.config[key].data = value
+
+
+async def _seed_users(session_maker, accounts: int, roles: int):
+    game_ids = [GAMEID_HT, GAMEID_NTE]
+    async with session_maker() as session:
+        async with session.begin():
+            for i in range(accounts):
+                tgd_uid = str(10_000_000 + i)
+                base = dict(
+                    user_id=f"bench_{i}",
+                    bot_id=BENCH_BOT_ID,
+                    cookie=f"rt-{tgd_uid}-seed",
+                    tgd_uid=tgd_uid,
+                    device_id=f"device{i}",
+                    sign_switch="on",
+                )
+                if roles <= 0:
+                    session.add(TGDUser(uid=tgd_uid, role_name="", **base))
+                    continue
+                for r in range(roles):
+                    game_id = game_ids[r % len(game_ids)]
+                    session.add(
+                        TGDUser(
+                            uid=f"{tgd_uid}{game_id}{r}",
+                            role_name=f"角色{i}-{r}",
+                            game_id=game_id,
+                            **base,
+                        )
+                    )
+
+
+def _percentile(data: List[float], pct: float) -> float:
+    if not data:
+        return 0.0
+    data = sorted(data)
+    idx = min(len(data) - 1, int(round(pct / 100 * (len(data) - 1))))
+    return data[idx]
+
+
+async def run(args: argparse.Namespace):
+    tracemalloc.start()
+
+    tmp_dir = Path(tempfile.mkdtemp(prefix="tgd_bench_"))
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_dir / 'bench.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+    session_maker = async_sessionmaker(engine, expire_on_commit=False)
+    base_models.async_maker = session_maker
+
+    await _seed_users(session_maker, args.accounts, args.roles)
+    db_timer = DBTimer(engine)
+
+    fake = FakeTajiduo(
+        latency=tuple(args.latency),
+        error_rate=args.error_rate,
+        rate_limit=args.server_rate_limit,
+        expired_rate=args.expired_rate,
+        seed=args.seed,
+    )
+    await tgd_api.set_transport(fake.transport())
+
+    _override_config("SigninMaster", True)
+    _override_config("PrivateSignReport", False)
+    _override_config("GroupSignReport", False)
+    _override_config("SigninConcurrentNum", args.concurrency)
+    _override_config("SigninMaxConcurrentNum", args.max_concurrency)
+    _override_config("ApiRateSign", args.client_rate_limit)
+    _override_config("ApiRateRead", args.client_rate_limit * 2)
+    sign_handler.RETRY_PASS_DELAY = args.retry_delay
+
+    account_times: List[float] = []
+    do_sign = sign_handler._do_sign_for_account
+
+    async def _timed_sign(*a, **kw):
+        start = time.perf_counter()
+        try:
+            return await do_sign(*a, **kw)
+        finally:
+            account_times.append(time.perf_counter() - start)
+
+    sign_handler._do_sign_for_account = _timed_sign
+
+    start = time.perf_counter()
+    result = await sign_handler.tgd_auto_sign_task()
+    elapsed = time.perf_counter() - start
+
+    _, peak = tracemalloc.get_traced_memory()
+    await tgd_api.close()
+    await engine.dispose()
+
+    print(result)
+    print("=" * 40)
+    print(f"账号数:          {args.accounts} (每账号 {args.roles} 个角色)")
+    print(f"总耗时:          {elapsed:.2f}s")
+    print(f"吞吐:            {args.accounts / elapsed:.1f} 账号/秒")
+    print(f"单账号 p50:      {_percentile(account_times, 50) * 1000:.0f}ms")
+    print(f"单账号 p95:      {_percentile(account_times, 95) * 1000:.0f}ms")
+    if account_times:
+        print(f"单账号平均:      {statistics.mean(account_times) * 1000:.0f}ms")
+    print(f"SQL 执行:        {db_timer.count} 次, 共 {db_timer.total:.2f}s")
+    print(f"内存峰值:        {peak / 1024 / 1024:.1f}MB")
+    print(f"模拟服务请求:    {dict(fake.stats)}")
+    print(f"临时数据库:      {tmp_dir}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="TGDSign 自动签到压测")
+    parser.add_argument("--accounts", type=int, default=1000)
+    parser.add_argument("--roles", type=int, default=2, help="每个账号的角色数")
+    parser.add_argument(
+        "--latency", type=float, nargs=2, default=[0.05, 0.15],
+        metavar=("MIN", "MAX"), help="模拟接口延迟区间(秒)",
+    )
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--expired-rate", type=float, default=0.0)
+    parser.add_argument(
+        "--server-rate-limit", type=int, default=0,
+        help="模拟服务端每秒最大请求数, 0 为不限",
+    )
+    parser.add_argument(
+        "--client-rate-limit", type=int, default=0,
+        help="客户端签到接口限速(次/秒), 0 为不限",
+    )
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--max-concurrency", type=int, default=32)
+    parser.add_argument(
+        "--retry-delay", type=float, default=1.0,
+        help="限流/网络失败账号第一轮重试前的等待秒数",
+    )
+    parser.add_argument("--seed", type=int, default=None)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+"""本地模拟的塔吉多 / 老虎用户中心接口
+
+以 httpx.MockTransport 的形式替换 TaygedoApi 的传输层, 可配置延迟、
+错误率和服务端限流, 用于在不访问线上接口的情况下压测签到流程:
+
+    fake = FakeTajiduo(latency=(0.05, 0.2), error_rate=0.01, rate_limit=50)
+    await tgd_api.set_transport(fake.transport())
+"""
+
+import json
+import time
+import uuid
+import random
+import asyncio
+from collections import Counter, deque
+from typing import Deque, Dict, Optional, Set, Tuple
+from urllib.parse import parse_qs
+
+import httpx
+
+REWARD_DAYS = 31
+
+
+class FakeTajiduo:
+    def __init__(
+        self,
+        latency: Tuple[float, float] = (0.05, 0.15),
+        error_rate: float = 0.0,
+        rate_limit: int = 0,
+        expired_rate: float = 0.0,
+        roles_per_game: int = 1,
+        seed: Optional[int] = None,
+    ):
+        """
+        latency: 每个请求的随机延迟区间 (秒)
+        error_rate: 返回 502 的概率
+        rate_limit: 每秒最多处理的请求数, 超出返回"请求过于频繁", 0 为不限
+        expired_rate: refreshToken 返回 402 (token 失效) 的概率
+        roles_per_game: getGameRoles 每个游戏返回的角色数
+        """
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.expired_rate = expired_rate
+        self.roles_per_game = roles_per_game
+        self.random = random.Random(seed)
+
+        self.stats: Counter = Counter()
+        self._window: Deque[float] = deque()
+        self._app_signed: Set[str] = set()
+        self._game_signed: Set[Tuple[str, str]] = set()
+        self._sign_days: Dict[Tuple[str, str], int] = {}
+        self._access_tokens: Dict[str, str] = {}
+
+        self._routes = {
+            "/m/newApi/sendPhoneCaptchaWithOutLogin": self._send_captcha,
+            "/m/newApi/checkPhoneCaptchaWithOutLogin": self._check_captcha,
+            "/openApi/sms/new/login": self._login,
+            "/usercenter/api/login": self._user_center_login,
+            "/usercenter/api/refreshToken": self._refresh_token,
+            "/apihub/api/getGameBindRole": self._get_bind_role,
+            "/usercenter/api/v2/getGameRoles": self._get_game_roles,
+            "/apihub/api/signin": self._app_signin,
+            "/apihub/awapi/sign": self._game_signin,
+            "/apihub/awapi/signin/state": self._signin_state,
+            "/apihub/awapi/sign/rewards": self._signin_rewards,
+            "/bbs/wapi/getUserPostList": self._post_list,
+            "/bbs/wapi/getPostFull": self._post_full,
+        }
+
+    def transport(self) -> httpx.MockTransport:
+        return httpx.MockTransport(self.handle)
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        path = request.url.path
+        self.stats[path] += 1
+        await asyncio.sleep(self.random.uniform(*self.latency))
+
+        if self._is_rate_limited():
+            self.stats["rate_limited"] += 1
+            return _json({"code": -1, "msg": "请求过于频繁，请稍后再试"})
+        if self.random.random() < self.error_rate:
+            self.stats["server_error"] += 1
+            return httpx.Response(502, text="Bad Gateway")
+
+        route = self._routes.get(path)
+        if route is None:
+            return httpx.Response(404, text="Not Found")
+        return route(request)
+
+    def _is_rate_limited(self) -> bool:
+        if self.rate_limit <= 0:
+            return False
+        now = time.monotonic()
+        while self._window and now - self._window[0] > 1:
+            self._window.popleft()
+        if len(self._window) >= self.rate_limit:
+            return True
+        self._window.append(now)
+        return False
+
+    def _authorized(self, request: httpx.Request) -> bool:
+        token = request.headers.get("authorization", "")
+        return token in self._access_tokens
+
+    # ===================== 用户中心 =====================
+
+    def _send_captcha(self, request: httpx.Request) -> httpx.Response:
+        return _json({"code": 0, "message": "手机短信发送成功"})
+
+    def _check_captcha(self, request: httpx.Request) -> httpx.Response:
+        return _json({"code": 0, "message": "手机验证码正确"})
+
+    def _login(self, request: httpx.Request) -> httpx.Response:
+        return _json({
+            "code": 0,
+            "message": "登陆成功",
+            "result": {"token": uuid.uuid4().hex, "userId": self.random.randint(1, 10**8)},
+        })
+
+    def _issue_tokens(self, tgd_uid: str) -> dict:
+        access_token = f"at-{uuid.uuid4().hex}"
+        self._access_tokens[access_token] = tgd_uid
+        return {
+            "accessToken": access_token,
+            "refreshToken": f"rt-{tgd_uid}-{uuid.uuid4().hex}",
+            "uid": tgd_uid,
+        }
+
+    def _user_center_login(self, request: httpx.Request) -> httpx.Response:
+        form = _form(request)
+        tgd_uid = form.get("userIdentity", "0")
+        return _json({"code": 0, "msg": "ok", "data": self._issue_tokens(tgd_uid)})
+
+    def _refresh_token(self, request: httpx.Request) -> httpx.Response:
+        refresh_token = request.headers.get("authorization", "")
+        if not refresh_token.startswith("rt-"):
+            return httpx.Response(402)
+        if self.random.random() < self.expired_rate:
+            self.stats["token_expired"] += 1
+            return httpx.Response(402)
+        tgd_uid = refresh_token.split("-")[1]
+        return _json({"code": 0, "msg": "ok", "data": self._issue_tokens(tgd_uid)})
+
+    # ===================== 角色与签到 =====================
+
+    def _get_bind_role(self, request: httpx.Request) -> httpx.Response:
+        if not self._authorized(request):
+            return httpx.Response(401)
+        uid = request.url.params.get("uid", "")
+        game_id = request.url.params.get("gameId", "")
+        return _json({
+            "code": 0,
+            "msg": "ok",
+            "data": {
+                "roleId": f"{uid}{game_id}0",
+                "roleName": f"角色{uid}-{game_id}-0",
+                "gameId": game_id,
+            },
+        })
+
+    def _get_game_roles(self, request: httpx.Request) -> httpx.Response:
+        if not self._authorized(request):
+            return httpx.Response(401)
+        uid = request.headers.get("uid", "")
+        game_id = request.url.params.get("gameId", "")
+        roles = [
+            {
+                "roleId": f"{uid}{game_id}{i}",
+                "roleName": f"角色{uid}-{game_id}-{i}",
+                "gameId": game_id,
+            }
+            for i in range(self.roles_per_game)
+        ]
+        return _json({"code": 0, "msg": "ok", "data": {"roles": roles}})
+
+    def _app_signin(self, request: httpx.Request) -> httpx.Response:
+        if not self._authorized(request):
+            return httpx.Response(401)
+        uid = request.headers.get("uid", "")
+        if uid in self._app_signed:
+            return _json({"code": -1, "msg": "今日已经签到"})
+        self._app_signed.add(uid)
+        return _json({"code": 0, "msg": "ok", "data": {"exp": 10, "goldCoin": 20}})
+
+    def _game_signin(self, request: httpx.Request) -> httpx.Response:
+        if not self._authorized(request):
+            return httpx.Response(401)
+        form = _form(request)
+        key = (form.get("roleId", ""), form.get("gameId", ""))
+        if key in self._game_signed:
+            return _json({"code": -1, "msg": "今日已经签到"})
+        self._game_signed.add(key)
+        day_key = (self._access_tokens[request.headers["authorization"]], key[1])
+        self._sign_days[day_key] = self._sign_days.get(day_key, 0) + 1
+        return _json({"code": 0, "msg": "ok"})
+
+    def _signin_state(self, request: httpx.Request) -> httpx.Response:
+        if not self._authorized(request):
+            return httpx.Response(401)
+        tgd_uid = self._access_tokens[request.headers["authorization"]]
+        game_id = request.url.params.get("gameId", "")
+        days = self._sign_days.get((tgd_uid, game_id), 0)
+        return _json({"code": 0, "msg": "ok", "data": {"days": days}})
+
+    def _signin_rewards(self, request: httpx.Request) -> httpx.Response:
+        if not self._authorized(request):
+            return httpx.Response(401)
+        rewards = [{"name": f"奖励{i + 1}", "num": 1} for i in range(REWARD_DAYS)]
+        return _json({"code": 0, "msg": "ok", "data": rewards})
+
+    # ===================== 论坛公告 =====================
+
+    def _post_list(self, request: httpx.Request) -> httpx.Response:
+        count = int(request.url.params.get("count", 20))
+        posts = [
+            {
+                "postId": 1000 + i,
+                "subject": f"公告{i}",
+                "content": f"公告内容{i}",
+                "createTime": int(time.time() * 1000),
+                "images": [],
+                "postStat": {"likeNum": 0, "commentNum": 0, "collectNum": 0},
+            }
+            for i in range(count)
+        ]
+        return _json({"code": 0, "msg": "ok", "data": {"posts": posts}})
+
+    def _post_full(self, request: httpx.Request) -> httpx.Response:
+        post_id = request.url.params.get("postId", "0")
+        post = {
+            "postId": post_id,
+            "subject": f"公告{post_id}",
+            "content": f"<p>公告内容{post_id}</p>",
+            "createTime": int(time.time() * 1000),
+            "postStat": {},
+        }
+        return _json({"code": 0, "msg": "ok", "data": {"post": post}})
+
+
+def _json(body: dict, status_code: int = 200) -> httpx.Response:
+    return httpx.Response(
+        status_code,
+        content=json.dumps(body, ensure_ascii=False).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+    )
+
+
+def _form(request: httpx.Request) -> Dict[str, str]:
+    parsed = parse_qs(request.content.decode("utf-8"))
+    return {k: v[0] for k, v in parsed.items()}
@@ -0,0 +1,88 @@
+"""启动迁移: 补建唯一索引前的重复行清理
+
+与 bench/bench_sign.py 相同, 使用临时 SQLite 数据库并替换 gsuid_core 的会话工厂,
+需要在装有 gsuid_core 的环境中于仓库根目录运行 pytest。
+"""
+
+import asyncio
+
+import pytest
+
+pytest.importorskip("gsuid_core")
+pytest.importorskip("aiosqlite")
+
+from sqlmodel import SQLModel, select  # noqa: E402
+from sqlalchemy import text  # noqa: E402
+from sqlalchemy.ext.asyncio import (  # noqa: E402
+    async_sessionmaker,
+    create_async_engine,
+)
+from gsuid_core.utils.database import base_models  # noqa: E402
+
+from TGDSign.utils.database import models  # noqa: E402
+from TGDSign.utils.database.models import (  # noqa: E402
+    TGDUser,
+    TGDSignRecord,
+)
+
+
+async def _legacy_db(tmp_path, drop_index: str):
+    """建表后删掉唯一索引, 模拟升级前的数据库"""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'tgd.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+        await conn.execute(text(f"DROP INDEX {drop_index}"))
+    maker = async_sessionmaker(engine, expire_on_commit=False)
+    base_models.async_maker = maker
+    models._unique_keys.clear()
+    return engine, maker
+
+
+def test_legacy_empty_uid_accounts_survive_user_dedupe(tmp_path):
+    async def _run():
+        engine, maker = await _legacy_db(tmp_path, "ux_tgduser_user_bot_uid")
+        base = dict(user_id="u1", bot_id="onebot", uid="")
+        async with maker() as session, session.begin():
+            session.add(TGDUser(tgd_uid="A", cookie="rt-A", **base))
+            session.add(TGDUser(tgd_uid="B", cookie="rt-B", **base))
+            # 同一账号 A 的重复记录, 只保留最新一条
+            session.add(TGDUser(tgd_uid="A", cookie="rt-A-new", **base))
+
+        await models.migrate_tgd_indexes()
+
+        async with maker() as session:
+            rows = (await session.execute(select(TGDUser))).scalars().all()
+        await engine.dispose()
+        return {(r.tgd_uid, r.uid, r.cookie) for r in rows}
+
+    assert asyncio.run(_run()) == {
+        ("A", "A", "rt-A-new"),
+        ("B", "B", "rt-B"),
+    }
+
+
+def test_sign_record_dedupe_keeps_signed_flags(tmp_path):
+    async def _run():
+        engine, maker = await _legacy_db(tmp_path, "ux_tgdsignrecord_uid_date")
+        day = "2026-10-17"
+        async with maker() as session, session.begin():
+            # 较早的行未签到, 较晚的行已签到
+            session.add(TGDSignRecord(uid="r1", date=day, app_sign=0, game_sign=0))
+            session.add(TGDSignRecord(uid="r1", date=day, app_sign=1, game_sign=1))
+            # 标记分散在两行
+            session.add(TGDSignRecord(uid="r2", date=day, app_sign=1, game_sign=0))
+            session.add(TGDSignRecord(uid="r2", date=day, app_sign=0, game_sign=1))
+            session.add(TGDSignRecord(uid="r3", date=day, app_sign=0, game_sign=0))
+
+        await models.migrate_tgd_indexes()
+
+        async with maker() as session:
+            rows = (await session.execute(select(TGDSignRecord))).scalars().all()
+        await engine.dispose()
+        return sorted((r.uid, r.app_sign, r.game_sign) for r in rows)
+
+    assert asyncio.run(_run()) == [
+        ("r1", 1, 1),
+        ("r2", 1, 1),
+        ("r3", 0, 0),
+    ]
@@ -0,0 +1,54 @@
+"""签到结果推送: 多连接时的投递
+
+需要在装有 gsuid_core 的环境中于仓库根目录运行 pytest。
+"""
+
+import asyncio
+
+import pytest
+
+pytest.importorskip("gsuid_core")
+
+from gsuid_core.gss import gss  # noqa: E402
+
+from TGDSign.utils.report import ReportDispatcher  # noqa: E402
+
+
+class _FakeBot:
+    """记录 target_send 调用; 与 WS 连接一样, 目标不在本连接上时也不报错"""
+
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.calls = []
+
+    async def target_send(self, message, target_type, target_id, *args):
+        if self.fail:
+            raise ConnectionError("closed")
+        self.calls.append((message, target_type, target_id))
+
+
+def test_report_reaches_adapter_on_second_connection(monkeypatch):
+    first, second = _FakeBot(), _FakeBot()
+    monkeypatch.setattr(gss, "active_bot", {"ws-1": first, "ws-2": second})
+
+    async def _run():
+        async with ReportDispatcher(rate=0) as dispatcher:
+            dispatcher.submit("onebot", "direct", "10001", "签到完成")
+        return dispatcher
+
+    dispatcher = asyncio.run(_run())
+    assert second.calls == [("签到完成", "direct", "10001")]
+    assert (dispatcher.sent, dispatcher.failed) == (1, 0)
+
+
+def test_report_counts_failed_only_when_every_connection_fails(monkeypatch):
+    bots = {"ws-1": _FakeBot(fail=True), "ws-2": _FakeBot(fail=True)}
+    monkeypatch.setattr(gss, "active_bot", bots)
+
+    async def _run():
+        async with ReportDispatcher(rate=0) as dispatcher:
+            dispatcher.submit("onebot", "group", "20002", "签到完成")
+        return dispatcher
+
+    dispatcher = asyncio.run(_run())
+    assert (dispatcher.sent, dispatcher.failed) == (0, 1)